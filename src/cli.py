@@ -0,0 +1,613 @@
+"""命令行入口，不依赖 PyQt，可在无图形界面的服务器上运行
+
+用法示例:
+    python -m src.cli crawl -1001234567890 --limit 1000
+    python -m src.cli crawl -1001234567890 --media metadata --queue-types photo --queue-max-mb 5
+    python -m src.cli media drain
+    python -m src.cli resume -1001234567890
+    python -m src.cli sync -1001234567890 @another_group --interval 3600
+    python -m src.cli listen -1001234567890 --flush-size 200 --flush-interval 2
+    python -m src.cli export -1001234567890 --format parquet --output data/parquet
+    python -m src.cli stats -1001234567890
+
+进度和结果以 JSON Lines 的形式输出到标准输出，每行一个事件；爬虫的日志输出到标准错误。
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import json
+import os
+import signal
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# 将项目根目录添加到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.config_manager import ConfigManager
+from src.data_processor import DataProcessor
+from src.download_manager import DownloadManager
+from src.stats_aggregator import StatsAggregator
+
+# 退出码
+EXIT_OK = 0
+EXIT_ERROR = 1  # 运行失败
+EXIT_USAGE = 2  # 参数或配置错误
+EXIT_PARTIAL = 3  # 部分群组失败
+EXIT_INTERRUPTED = 130  # 被信号中断
+
+PROXY_TYPES = {'SOCKS5': 2, 'SOCKS4': 1, 'HTTP': 3}  # 与 socks 模块中的常量一致
+
+
+class UsageError(Exception):
+    """参数或配置错误"""
+
+
+class EventWriter:
+    """以 JSON Lines 格式向标准输出写事件，同一群组的进度事件限频输出"""
+
+    def __init__(self, stream, min_interval=1.0):
+        self.stream = stream
+        self.min_interval = min_interval
+        self._last_progress = {}  # group -> (输出时间, 进度百分比)
+
+    def emit(self, event, **fields):
+        record = {'event': event, 'time': datetime.now().isoformat(timespec='seconds'), **fields}
+        self.stream.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self.stream.flush()
+
+    def progress(self, group, progress, message):
+        now = time.monotonic()
+        last = self._last_progress.get(group)
+        if last and progress < 100 and int(progress) == int(last[1]) and now - last[0] < self.min_interval:
+            return
+        self._last_progress[group] = (now, progress)
+        self.emit('progress', group=group, progress=round(progress, 2), message=message)
+
+
+def parse_date(value):
+    """解析 YYYY-MM-DD 或 YYYY-MM-DD HH:MM[:SS] 格式的时间"""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无法解析时间: {value}")
+
+
+def load_settings(args):
+    """合并配置文件、环境变量和命令行参数"""
+    config = ConfigManager(args.config)._read_config()
+    api_id = args.api_id or os.environ.get('TG_API_ID') or config.get('api_id')
+    api_hash = args.api_hash or os.environ.get('TG_API_HASH') or config.get('api_hash')
+    if not api_id or not api_hash:
+        raise UsageError("缺少 API ID 或 API Hash，请通过配置文件、环境变量或命令行参数提供")
+    try:
+        api_id = int(api_id)
+    except ValueError:
+        raise UsageError("API ID 必须是数字")
+
+    proxy = config.get('proxy_config')
+    if args.proxy:
+        parts = args.proxy.split(':')
+        if len(parts) not in (2, 3):
+            raise UsageError("代理格式应为 地址:端口[:SOCKS5|SOCKS4|HTTP]")
+        proxy = {'proxy_type': parts[2] if len(parts) == 3 else 'SOCKS5', 'addr': parts[0], 'port': parts[1], 'rdns': True}
+    if proxy:
+        proxy = dict(proxy)
+        if isinstance(proxy.get('proxy_type'), str):
+            if proxy['proxy_type'].upper() not in PROXY_TYPES:
+                raise UsageError(f"不支持的代理类型: {proxy['proxy_type']}")
+            proxy['proxy_type'] = PROXY_TYPES[proxy['proxy_type'].upper()]
+        proxy['port'] = int(proxy['port'])
+    return api_id, api_hash, proxy
+
+
+def group_ids_from(args):
+    """命令行给出的群组，未给出时使用配置文件中的 group_id"""
+    group_ids = args.groups
+    if not group_ids:
+        config = ConfigManager(args.config)._read_config()
+        group_ids = [config['group_id']] if config.get('group_id') else []
+    if not group_ids:
+        raise UsageError("请指定至少一个群组")
+    return list(dict.fromkeys(group_ids))
+
+
+async def prompt(text, env_name):
+    """登录时读取手机号或验证码：优先使用环境变量，其次在终端中询问"""
+    value = os.environ.get(env_name)
+    if value:
+        return value
+    if not sys.stdin.isatty():
+        return None
+    print(text, end='', file=sys.stderr, flush=True)
+    return (await asyncio.get_running_loop().run_in_executor(None, sys.stdin.readline)).strip()
+
+
+def load_media_policy(args):
+    """--media-policy 指定的 JSON 文件，未指定时使用配置文件中的 media_policy"""
+    from src.media_policy import MediaPolicy
+
+    if args.media_policy:
+        try:
+            with open(args.media_policy, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            raise UsageError(f"无法读取媒体策略文件: {str(e)}")
+    else:
+        config = ConfigManager(args.config).load_media_policy()
+    if not config:
+        return None
+    try:
+        return MediaPolicy.from_dict(config)
+    except Exception as e:
+        raise UsageError(str(e))
+
+
+def build_crawler(args):
+    """按命令行参数创建爬虫实例"""
+    from src.crawler import TelegramCrawler
+
+    api_id, api_hash, proxy = load_settings(args)
+    crawler = TelegramCrawler(
+        api_id, api_hash,
+        download_path=args.download_path,
+        proxy=proxy,
+        data_processor=DataProcessor(args.data_dir),
+        session_name=args.session
+    )
+    crawler.parallel_parts = args.download_parts
+    crawler.parallel_threshold = args.parallel_threshold_mb * 1024 * 1024
+    crawler.media_policy = load_media_policy(args)
+    crawler.phone_code_callback = lambda: prompt("请输入手机号: ", 'TG_PHONE')
+    crawler.code_callback = lambda: prompt("请输入验证码: ", 'TG_CODE')
+    return crawler
+
+
+def media_rule(args):
+    """按 --queue-types/--queue-max-mb 生成自动排队规则，均未指定时返回 None"""
+    types = set(args.queue_types.split(',')) if args.queue_types else None
+    max_bytes = args.queue_max_mb * 1024 * 1024 if args.queue_max_mb is not None else None
+    if types is None and max_bytes is None:
+        return None
+
+    def rule(row):
+        if types is not None and row['media_type'] not in types:
+            return False
+        if max_bytes is not None and (row.get('media_size') or 0) > max_bytes:
+            return False
+        return True
+    return rule
+
+
+def open_media_queue(args):
+    from src.media_queue import MediaQueue
+
+    return MediaQueue(os.path.join(args.data_dir, "media_queue.db"))
+
+
+def configure_media(crawler, args, media_queue):
+    """--media metadata 时只记录媒体信息并登记到下载队列"""
+    crawler.media_mode = args.media
+    crawler.media_queue = media_queue
+    crawler.media_rule = media_rule(args)
+
+
+def watch_stats(args, events, stats):
+    """包装群组进度回调，每隔 --stats-interval 秒输出一次本次运行的实时统计"""
+    last = [time.monotonic()]
+
+    def on_progress(group_id, progress, message):
+        events.progress(group_id, progress, message)
+        now = time.monotonic()
+        if args.stats_interval and now - last[0] >= args.stats_interval:
+            last[0] = now
+            events.emit('live_stats', **stats.snapshot())
+    return on_progress
+
+
+def summarize(events, results):
+    """输出每个群组的结果，返回退出码
+
+    结果为处理的消息数或异常；会话池分片爬取时为 {'count', 'shards', 'errors'}，
+    部分分片失败的群组输出 group_partial，计为部分失败。
+    """
+    failed = 0
+    partial = 0
+    for group_id, result in results.items():
+        if isinstance(result, dict):
+            errors = result['errors']
+            if len(errors) == result['shards']:
+                result = errors[0]
+            elif errors:
+                partial += 1
+                events.emit('group_partial', group=group_id, messages=result['count'],
+                            failed_shards=len(errors), shards=result['shards'],
+                            errors=[str(error) for error in errors])
+                continue
+            else:
+                result = result['count']
+        if isinstance(result, Exception):
+            failed += 1
+            events.emit('group_failed', group=group_id, error=str(result))
+        else:
+            events.emit('group_done', group=group_id, messages=result)
+    if failed == 0 and partial == 0:
+        return EXIT_OK
+    return EXIT_ERROR if failed == len(results) else EXIT_PARTIAL
+
+
+def crawl_options(args, events):
+    """crawl/resume 共用的爬取参数"""
+    return {
+        'limit': args.limit,
+        'from_date': args.from_date,
+        'reverse': args.reverse,
+        'keep_messages': False,
+        'media_callback': lambda row: events.emit(
+            'media', group=row['group'], id=row['id'], status=row['media_status'], path=row['media_path']
+        )
+    }
+
+
+async def run_crawl(args, events, resume=False):
+    group_ids = group_ids_from(args)
+    options = crawl_options(args, events)
+    stats = StatsAggregator()
+    group_callback = watch_stats(args, events, stats)
+    media_queue = open_media_queue(args) if args.media == 'metadata' else None
+
+    try:
+        if args.pool:
+            from src.session_pool import SessionPool
+
+            accounts = ConfigManager(args.config).load_accounts()
+            if not accounts:
+                raise UsageError("配置文件中没有可用的账号")
+            _, _, proxy = load_settings(args)
+            pool = SessionPool(accounts, download_path=args.download_path, proxy=proxy,
+                               data_processor=DataProcessor(args.data_dir))
+            # 所有账号共用同一个策略，群组用量合并计算
+            media_policy = load_media_policy(args)
+            try:
+                await pool.connect(parquet_dir=args.parquet_dir)
+                for account in pool.accounts:
+                    configure_media(account.crawler, args, media_queue)
+                    account.crawler.media_policy = media_policy
+                    account.crawler.stats = stats
+                results = await pool.crawl(
+                    group_ids, args.start_date,
+                    shard_ranges=args.shard,
+                    group_progress_callback=group_callback,
+                    resume=resume,
+                    **options
+                )
+                events.emit('accounts', accounts=pool.status())
+            finally:
+                await pool.close()
+            events.emit('run_stats', **stats.snapshot())
+            return summarize(events, results)
+
+        crawler = build_crawler(args)
+        configure_media(crawler, args, media_queue)
+        crawler.stats = stats
+        try:
+            results = await crawler.crawl_groups(
+                group_ids, args.start_date,
+                group_progress_callback=group_callback,
+                parquet_dir=args.parquet_dir,
+                resume=resume,
+                **options
+            )
+        except Exception as e:
+            # 所有群组都失败时 crawl_groups 抛出异常，逐个输出失败原因
+            events.emit('error', message=str(e))
+            return EXIT_ERROR
+        events.emit('run_stats', **stats.snapshot())
+        return summarize(events, results)
+    finally:
+        if media_queue:
+            events.emit('media_queue', counts=media_queue.counts(group_ids))
+            media_queue.close()
+
+
+async def run_sync(args, events):
+    group_ids = group_ids_from(args)
+    crawler = build_crawler(args)
+    media_queue = open_media_queue(args) if args.media == 'metadata' else None
+    configure_media(crawler, args, media_queue)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+
+    try:
+        exit_code = EXIT_OK
+        while True:
+            events.emit('sync_started', groups=group_ids)
+            # 每轮同步单独统计新消息
+            crawler.stats = StatsAggregator()
+            try:
+                results = await crawler.sync_groups(
+                    group_ids,
+                    group_progress_callback=watch_stats(args, events, crawler.stats),
+                    parquet_dir=args.parquet_dir
+                )
+                events.emit('run_stats', **crawler.stats.snapshot())
+                exit_code = summarize(events, results)
+            except Exception as e:
+                events.emit('error', message=str(e))
+                exit_code = EXIT_ERROR
+
+            # 未指定间隔时只同步一次；守护模式下等待下一轮，收到 SIGTERM/SIGINT 时正常退出
+            if not args.interval:
+                return exit_code
+            events.emit('sleeping', seconds=args.interval)
+            try:
+                await asyncio.wait_for(stop.wait(), args.interval)
+                events.emit('stopped')
+                return EXIT_OK
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        if media_queue:
+            media_queue.close()
+
+
+async def run_listen(args, events):
+    group_ids = group_ids_from(args)
+    crawler = build_crawler(args)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+
+    if args.catch_up:
+        # 先补齐上次停止以来的消息，再开始实时监听
+        results = await crawler.sync_groups(group_ids)
+        if summarize(events, results) != EXIT_OK:
+            return EXIT_PARTIAL
+
+    def on_flush(rows):
+        counts = {}
+        for row in rows:
+            counts[row['group']] = counts.get(row['group'], 0) + 1
+        events.emit('flushed', rows=len(rows), groups=counts)
+
+    events.emit('listening', groups=group_ids)
+    await crawler.listen(
+        group_ids,
+        stop_event=stop,
+        flush_size=args.flush_size,
+        flush_interval=args.flush_interval,
+        flush_callback=on_flush,
+        parquet_dir=args.parquet_dir
+    )
+    events.emit('stopped')
+    # 连接断开而不是收到停止信号时返回非零，交给 systemd 等重启
+    return EXIT_OK if stop.is_set() else EXIT_ERROR
+
+
+async def run_media(args, events):
+    media_queue = open_media_queue(args)
+    try:
+        group_ids = list(dict.fromkeys(args.groups)) or None
+        if args.action == 'status':
+            events.emit('media_queue', groups=group_ids, counts=media_queue.counts(group_ids))
+            return EXIT_OK
+
+        if args.action == 'enqueue':
+            rule = media_rule(args)
+            statuses = ['deferred', 'failed'] if args.retry_failed else ['deferred']
+            selected = []
+            offset = 0
+            while True:
+                items = media_queue.list(group_ids, statuses, limit=1000, offset=offset)
+                if not items:
+                    break
+                selected.extend(item for item in items if rule is None or rule({**item, 'media_size': item['size']}))
+                offset += len(items)
+            media_queue.enqueue(selected)
+            events.emit('enqueued', groups=group_ids, media=len(selected))
+            return EXIT_OK
+
+        crawler = build_crawler(args)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            with contextlib.suppress(NotImplementedError):
+                loop.add_signal_handler(sig, stop.set)
+        stats = await crawler.drain_media_queue(
+            media_queue,
+            batch_size=args.batch_size,
+            media_callback=lambda item: events.emit(
+                'media', group=item['group'], id=item['id'], status=item['status'], path=item['media_path']
+            ),
+            stop_event=stop
+        )
+        events.emit('drained', counts=media_queue.counts(), **stats)
+        return EXIT_OK if not stats['failed'] else EXIT_PARTIAL
+    finally:
+        media_queue.close()
+
+
+def export_rows(data_processor, group_ids, output, fmt):
+    """导出为 csv、jsonl 或 xlsx，返回导出的行数"""
+    rows = data_processor.store.iter_messages(group_ids)
+    count = 0
+    if fmt == 'xlsx':
+        import pandas as pd
+
+        df = pd.DataFrame(list(rows))
+        if 'date' in df.columns:
+            df['date'] = df['date'].apply(lambda x: x.replace(tzinfo=None))
+        df.to_excel(output, sheet_name='消息数据', index=False)
+        return len(df)
+
+    with open(output, 'w', encoding='utf-8-sig' if fmt == 'csv' else 'utf-8', newline='') as f:
+        if fmt == 'csv':
+            from src.storage import MESSAGE_FIELDS
+
+            writer = csv.DictWriter(f, fieldnames=MESSAGE_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+        for row in rows:
+            if fmt == 'csv':
+                writer.writerow({**row, 'date': row['date'].isoformat() if row['date'] else ''})
+            else:
+                f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+            count += 1
+    return count
+
+
+def run_export(args, events):
+    group_ids = group_ids_from(args)
+    data_processor = DataProcessor(args.data_dir)
+    try:
+        if not data_processor.count_messages(group_ids):
+            events.emit('error', message="没有可导出的数据")
+            return EXIT_ERROR
+        output = args.output
+        if args.format == 'parquet':
+            output = output or os.path.join(args.data_dir, "parquet")
+            count = data_processor.export_parquet(group_ids, output)
+        else:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output = output or f"telegram_messages_{timestamp}.{args.format}"
+            count = export_rows(data_processor, group_ids, output, args.format)
+        events.emit('exported', groups=group_ids, format=args.format, output=output, rows=count)
+        return EXIT_OK
+    finally:
+        data_processor.close()
+
+
+def run_stats(args, events):
+    group_ids = group_ids_from(args)
+    data_processor = DataProcessor(args.data_dir)
+    try:
+        for group_id in group_ids:
+            stats = data_processor.statistics(group_id, top=args.top)
+            progress_info = data_processor.load_progress_info(group_id)
+            events.emit('stats', group=group_id, progress=progress_info, **stats)
+    finally:
+        data_processor.close()
+    download_manager = DownloadManager(args.download_path)
+    events.emit('downloads', records=download_manager.count())
+    download_manager.close()
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="Telegram 群组消息爬取工具（命令行版）")
+    parser.add_argument('--config', default="config.json", help="配置文件路径")
+    parser.add_argument('--api-id', help="API ID，默认读取配置文件或 TG_API_ID")
+    parser.add_argument('--api-hash', help="API Hash，默认读取配置文件或 TG_API_HASH")
+    parser.add_argument('--proxy', help="代理，格式为 地址:端口[:SOCKS5|SOCKS4|HTTP]")
+    parser.add_argument('--session', default="anon", help="会话名称")
+    parser.add_argument('--data-dir', default="data", help="数据保存目录")
+    parser.add_argument('--download-path', default="downloads", help="媒体文件保存目录")
+    parser.add_argument('--download-parts', type=int, default=4, help="大文件并发下载的段数")
+    parser.add_argument('--parallel-threshold-mb', type=int, default=64, help="超过多少 MB 的文件分段并发下载")
+    parser.add_argument('--media-policy', help="媒体下载策略 JSON 文件，默认使用配置文件中的 media_policy")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_crawl_arguments(sub):
+        sub.add_argument('groups', nargs='*', help="群组ID、用户名或邀请链接，默认使用配置文件中的群组")
+        sub.add_argument('--limit', type=int, help="每个群组最多爬取的消息数")
+        sub.add_argument('--start-date', type=parse_date, help="起始时间，只爬取该时间之前的消息")
+        sub.add_argument('--from-date', type=parse_date, help="最早时间，只爬取该时间之后的消息")
+        sub.add_argument('--reverse', action='store_true', help="从旧到新爬取")
+        sub.add_argument('--parquet-dir', help="同时流式写入 Parquet 的目录")
+        sub.add_argument('--pool', action='store_true', help="使用配置文件 accounts 中的多个账号")
+        sub.add_argument('--shard', action='store_true', help="多账号时按消息ID范围切分群组")
+        add_media_arguments(sub)
+        add_stats_arguments(sub)
+
+    def add_media_arguments(sub):
+        sub.add_argument('--media', choices=['download', 'metadata'], default='download',
+                         help="metadata 只记录媒体信息并登记到下载队列，之后用 media drain 下载")
+        add_rule_arguments(sub)
+
+    def add_stats_arguments(sub):
+        sub.add_argument('--stats-interval', type=float, default=10.0,
+                         help="爬取过程中每隔多少秒输出一次 live_stats 实时统计，0 为不输出")
+
+    def add_rule_arguments(sub):
+        sub.add_argument('--queue-types', help="自动排队的媒体类型，逗号分隔，如 photo,video")
+        sub.add_argument('--queue-max-mb', type=float, help="只自动排队不超过该大小的媒体")
+
+    add_crawl_arguments(subparsers.add_parser('crawl', help="爬取群组消息"))
+    add_crawl_arguments(subparsers.add_parser('resume', help="继续上次的爬取"))
+
+    sync = subparsers.add_parser('sync', help="同步上次保存之后的新消息")
+    sync.add_argument('groups', nargs='*', help="群组ID、用户名或邀请链接")
+    sync.add_argument('--interval', type=int, help="守护模式：每隔多少秒同步一次，直到收到 SIGTERM")
+    sync.add_argument('--parquet-dir', help="同时流式写入 Parquet 的目录")
+    add_media_arguments(sync)
+    add_stats_arguments(sync)
+
+    listen = subparsers.add_parser('listen', help="实时监听群组的新消息和编辑，直到收到 SIGTERM")
+    listen.add_argument('groups', nargs='*', help="群组ID、用户名或邀请链接")
+    listen.add_argument('--flush-size', type=int, default=100, help="缓冲多少条消息后写入")
+    listen.add_argument('--flush-interval', type=float, default=5.0, help="最长多少秒写入一次")
+    listen.add_argument('--catch-up', action='store_true', help="监听前先同步上次保存之后的消息")
+    listen.add_argument('--parquet-dir', help="同时流式写入 Parquet 的目录")
+
+    media = subparsers.add_parser('media', help="管理延后下载的媒体队列")
+    media.add_argument('action', choices=['status', 'enqueue', 'drain'],
+                       help="status 查看队列，enqueue 按规则排队，drain 下载排队中的媒体")
+    media.add_argument('groups', nargs='*', help="群组ID，默认全部群组")
+    add_rule_arguments(media)
+    media.add_argument('--retry-failed', action='store_true', help="enqueue 时同时重新排队失败的媒体")
+    media.add_argument('--batch-size', type=int, default=50, help="drain 每批获取的消息数")
+
+    export = subparsers.add_parser('export', help="导出已保存的消息")
+    export.add_argument('groups', nargs='*', help="群组ID")
+    export.add_argument('--format', choices=['csv', 'jsonl', 'parquet', 'xlsx'], default='csv')
+    export.add_argument('--output', help="输出文件（parquet 为目录）")
+
+    stats = subparsers.add_parser('stats', help="输出已保存消息的统计信息")
+    stats.add_argument('groups', nargs='*', help="群组ID")
+    stats.add_argument('--top', type=int, default=5, help="发言最多的用户数量")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    events = EventWriter(sys.stdout)
+
+    # 标准输出只保留 JSON 事件，爬虫中的 print 日志转到标准错误
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            if args.command == 'crawl':
+                return asyncio.run(run_crawl(args, events))
+            if args.command == 'resume':
+                return asyncio.run(run_crawl(args, events, resume=True))
+            if args.command == 'sync':
+                return asyncio.run(run_sync(args, events))
+            if args.command == 'listen':
+                return asyncio.run(run_listen(args, events))
+            if args.command == 'media':
+                return asyncio.run(run_media(args, events))
+            if args.command == 'export':
+                return run_export(args, events)
+            return run_stats(args, events)
+        except UsageError as e:
+            events.emit('error', message=str(e))
+            return EXIT_USAGE
+        except KeyboardInterrupt:
+            events.emit('stopped')
+            return EXIT_INTERRUPTED
+        except Exception as e:
+            events.emit('error', message=str(e))
+            return EXIT_ERROR
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,13 +6,14 @@ class ConfigManager:
         self.config_file = config_file
         
     def save_config(self, api_id, api_hash, group_id, proxy_config=None):
-        """保存配置到文件"""
-        config = {
+        """保存配置到文件，保留 accounts 等其他配置项"""
+        config = self._read_config()
+        config.update({
             'api_id': api_id,
             'api_hash': api_hash,
             'group_id': group_id,
             'proxy_config': proxy_config
-        }
+        })
         
         try:
             with open(self.config_file, 'w', encoding='utf-8') as f:
@@ -21,6 +22,32 @@ class ConfigManager:
         except Exception as e:
             print(f"保存配置失败: {str(e)}")
             
+    def _read_config(self):
+        """读取原始配置，文件不存在或无法解析时返回空字典"""
+        if not os.path.exists(self.config_file):
+            return {}
+        try:
+            with open(self.config_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+            
+    def load_accounts(self):
+        """加载会话池账号列表
+
+        配置文件中的 accounts 形如 [{"session": "acc1", "api_id": ..., "api_hash": ...}, ...]，
+        未配置时使用主账号（会话名 anon）。
+        """
+        config = self._read_config()
+        accounts = config.get('accounts') or []
+        if not accounts and config.get('api_id') and config.get('api_hash'):
+            accounts = [{'session': 'anon', 'api_id': config['api_id'], 'api_hash': config['api_hash']}]
+        return accounts
+            
+    def load_media_policy(self):
+        """加载媒体下载策略配置 media_policy，未配置时返回 None，格式见 MediaPolicy.from_dict"""
+        return self._read_config().get('media_policy')
+            
     def load_config(self):
         """从文件加载配置"""
         if not os.path.exists(self.config_file):
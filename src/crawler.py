@@ -3,22 +3,32 @@ from telethon.sessions import StringSession
 from telethon.errors import FloodWaitError, SessionPasswordNeededError, ServerError
 from telethon.tl.types import InputPeerChannel, InputPeerChat, PeerChannel
 from telethon.network import ConnectionTcpFull
+from telethon.tl import functions
+from telethon import utils
+from telethon import events
 import asyncio
-import pandas as pd
 import os
 from datetime import datetime, timezone
 import socks
 import time
 from src.data_processor import DataProcessor
 from src.download_manager import DownloadManager
+from src.download_pool import MediaDownloadPool
+from src.sender_cache import SenderCache
+from src.rate_limiter import RateLimiter
+from src.parquet_writer import ParquetWriter
+from src.media_policy import image_sizes
 
 class TelegramCrawler:
-    def __init__(self, api_id, api_hash, download_path="downloads", proxy=None):
+    def __init__(self, api_id, api_hash, download_path="downloads", proxy=None,
+                 max_concurrent_downloads=4, media_type_limits=None, sender_cache_path=None, sender_cache_ttl=7 * 24 * 3600,
+                 rate_limiter=None, data_processor=None, users_cache=None, session_name='anon'):
         self.api_id = api_id
         self.api_hash = api_hash
         self.download_path = download_path
         self.ensure_download_path()
         self.client = None
+        self.session_name = session_name
         self.proxy = proxy or {
             'proxy_type': socks.SOCKS5,
             'addr': '127.0.0.1',
@@ -26,12 +36,42 @@ class TelegramCrawler:
             'rdns': True
         }
         self.phone_code_callback = None
+        self.code_callback = None
         self.password_callback = None
         self.max_retries = 3  # 最大重试次数
         self.retry_delay = 5  # 重试延迟（秒）
-        self.users_cache = {}  # 添加用户信息缓存
-        self.data_processor = DataProcessor()
+        self.queue_size = 200  # 消息处理队列上限
+        self.users_batch_size = 100  # users.getUsers 单次最多查询的用户数
+        self.max_concurrent_downloads = max_concurrent_downloads  # 同时下载的文件数上限
+        # 按媒体类型的并发上限，大文件类型单独限制，避免占满全部下载槽位
+        self.media_type_limits = media_type_limits if media_type_limits is not None else {
+            'video': 2,
+            'document': 2
+        }
+        self.download_pool = None
+        self.parquet_writer = None
+        self.max_concurrent_groups = 4  # 多群组爬取时同时进行的群组数
+        self.history_page_size = 100  # iter_messages 每次请求返回的消息数
+        # 按请求类型自适应限流，可在多个爬虫实例之间共享
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.data_processor = data_processor or DataProcessor()
+        # 持久化的发送者缓存，所有群组和每次运行共享
+        self.users_cache = users_cache or SenderCache(
+            sender_cache_path or os.path.join(self.data_processor.save_dir, "sender_cache.db"),
+            ttl=sender_cache_ttl
+        )
         self.download_manager = DownloadManager(download_path)
+        self._media_in_flight = {}  # file_id -> 正在下载该媒体的 Future，同一媒体并发出现时只下载一次
+        self.resumable_threshold = 10 * 1024 * 1024  # 超过该大小的文档分块下载，可断点续传
+        self.download_chunk_size = 512 * 1024  # 分块大小，需为 4096 的倍数
+        self.partial_sync_bytes = 8 * 1024 * 1024  # 每写入多少字节同步一次磁盘并记录偏移量
+        self.parallel_threshold = 64 * 1024 * 1024  # 超过该大小的文档切分为多段并发下载
+        self.parallel_parts = 4  # 并发下载的段数
+        self.media_mode = 'download'  # 'download' 爬取时下载媒体，'metadata' 只记录媒体信息
+        self.media_queue = None  # MediaQueue，metadata 模式下登记媒体以便之后下载
+        self.media_rule = None  # media_rule(row) 为 True 的媒体直接加入下载队列
+        self.media_policy = None  # MediaPolicy，决定下载哪些媒体以及下载哪个尺寸
+        self.stats = None  # StatsAggregator，每处理一条消息计入一次，用于爬取过程中显示统计
         
     def ensure_download_path(self):
         """确保下载目录存在"""
@@ -51,10 +91,17 @@ class TelegramCrawler:
         return None
         
     async def _download_media_with_retry(self, message, max_retries=3):
-        """带重试机制的媒体下载"""
-        for attempt in range(max_retries):
+        """带重试机制的媒体下载，FloodWait 等待后重试且不计入重试次数"""
+        attempt = 0
+        while attempt < max_retries:
+            await self.rate_limiter.acquire('file')
             try:
-                return await self._download_media(message)
+                path = await self._download_media(message)
+                self.rate_limiter.on_success('file')
+                return path
+            except FloodWaitError as e:
+                await self.rate_limiter.on_flood_wait('file', e.seconds)
+                continue
             except Exception as e:
                 if attempt < max_retries - 1:
                     print(f"下载失败，{attempt + 1}/{max_retries} 次尝试: {str(e)}")
@@ -62,97 +109,280 @@ class TelegramCrawler:
                 else:
                     print(f"下载失败，已达到最大重试次数: {str(e)}")
                     return None
+            attempt += 1
 
+    def _media_size(self, message):
+        """媒体文件大小，照片取最大尺寸"""
+        if hasattr(message.media, 'document'):
+            return message.media.document.size
+        elif hasattr(message.media, 'photo'):
+            sizes = image_sizes(message.media.photo.sizes)
+            return sizes[-1][2] if sizes else 0
+        return 0
+        
+    def _media_variant(self, message, media_type):
+        """按媒体策略选择要下载的尺寸，返回 (thumb, 字节数)，没有符合要求的尺寸时返回 None"""
+        file_size = self._media_size(message)
+        if self.media_policy is None:
+            return None, file_size
+        return self.media_policy.choose(message, media_type, file_size)
+        
+    def _media_mime_type(self, message, media_type):
+        mime_type = getattr(getattr(message, 'file', None), 'mime_type', None)
+        if mime_type is None and media_type == 'photo':
+            mime_type = 'image/jpeg'
+        return mime_type
+        
+    def _media_allowed(self, message, group_id, media_type):
+        """按媒体策略检查是否下载该媒体并计入群组用量，没有策略时总是允许"""
+        if self.media_policy is None:
+            return True
+        choice = self._media_variant(message, media_type)
+        if choice is None:
+            self.media_policy.skipped += 1
+            return False
+        reason = self.media_policy.admit(group_id, media_type, choice[1], self._media_mime_type(message, media_type))
+        return reason is None
+        
+    def _media_key(self, message):
+        """Telegram 的照片/文档ID，转发或重复发送的同一媒体相同"""
+        document = getattr(message, 'document', None)
+        if document is not None:
+            return f"document_{document.id}"
+        photo = getattr(message, 'photo', None)
+        if photo is not None:
+            return f"photo_{photo.id}"
+        return None
+        
+    def _legacy_file_id(self, message, media_type):
+        """按媒体ID去重之前的文件标识（消息ID、类型和当时计算的大小），用于沿用旧的下载记录"""
+        if hasattr(message.media, 'document'):
+            file_size = message.media.document.size
+        elif hasattr(message.media, 'photo'):
+            sizes = message.media.photo.sizes
+            file_size = getattr(max(sizes, key=lambda x: getattr(x, 'size', 0)), 'size', 0) if sizes else 0
+        else:
+            file_size = 0
+        return self.download_manager.generate_file_id(message.id, media_type, file_size)
+        
     async def _download_media(self, message):
-        """下载媒体文件"""
+        """下载媒体文件
+
+        按 Telegram 的照片/文档ID去重：已下载过的媒体不再下载，只为本条消息创建硬链接
+        （或直接引用），同时出现的相同媒体等待第一次下载完成后复用。
+        下载出错时抛出异常，由 _download_media_with_retry 重试。
+        """
         if not message.media:
             return None
             
-        try:
-            # 获取媒体信息
-            media_type = self._get_media_type(message)
-            file_size = 0
+        # 获取媒体信息，媒体策略可能只下载较小的尺寸
+        media_type = self._get_media_type(message)
+        choice = self._media_variant(message, media_type)
+        if choice is None:
+            raise Exception("没有符合媒体策略的尺寸")
+        thumb, file_size = choice
             
-            if hasattr(message.media, 'document'):
-                file_size = message.media.document.size
-            elif hasattr(message.media, 'photo'):
-                sizes = message.media.photo.sizes
-                largest_size = max(sizes, key=lambda x: getattr(x, 'size', 0) if hasattr(x, 'size') else 0)
-                file_size = getattr(largest_size, 'size', 0)
-                
-            # 生成文件ID
-            file_id = self.download_manager.generate_file_id(message.id, media_type, file_size)
-            
-            # 检查是否已下载
-            if self.download_manager.is_file_completed(file_id, file_size):
-                file_path = self.download_manager.download_records[file_id]['file_path']
-                print(f"文件已存在且完整，跳过下载: {os.path.basename(file_path)}")
-                return file_path
+        # 生成文件ID，不同尺寸分别保存
+        media_key = self._media_key(message)
+        if media_key and thumb is not None:
+            media_key = f"{media_key}_{thumb}"
+        file_id = self.download_manager.generate_file_id(message.id, media_type, file_size, media_key)
+        if media_key and thumb is None:
+            # 升级前按消息ID记录的文件改用媒体ID记录，不必重新下载
+            self.download_manager.adopt_record(self._legacy_file_id(message, media_type), file_id)
+        original_name = getattr(message.media, 'filename', '')
+        link_name = f"{getattr(message, 'chat_id', '')}_{message.id}_{original_name or file_id}"
+        
+        # 同一媒体正在由其他消息下载时等待其完成，失败时自行下载
+        while file_id in self._media_in_flight:
+            path = await asyncio.shield(self._media_in_flight[file_id])
+            if path:
+                return self.download_manager.link_file(path, link_name, reused=True)
                 
-            # 获取保存路径
-            original_name = getattr(message.media, 'filename', '')
-            file_path = self.download_manager.get_file_path(file_id, original_name)
-            
-            # 创建进度回调
-            last_update = [0]
-            start_time = [time.time()]
-            
-            async def progress_callback(received, total):
-                if total:
-                    now = time.time()
-                    if now - last_update[0] >= 0.5:
-                        percentage = (received / total) * 100
-                        speed = received / (now - start_time[0]) / 1024
-                        
-                        if self.download_progress_callback:
-                            self.download_progress_callback(
-                                message.id,
-                                percentage,
-                                speed,
-                                media_type,
-                                os.path.basename(file_path),
-                                received,
-                                total
-                            )
-                        last_update[0] = now
-                        
-            # 下载文件
-            downloaded_path = await message.download_media(
-                file=file_path,
-                progress_callback=progress_callback
-            )
+        # 检查是否已下载
+        if self.download_manager.is_file_completed(file_id, file_size):
+            file_path = self.download_manager.get_record(file_id)['file_path']
+            print(f"文件已存在且完整，跳过下载: {os.path.basename(file_path)}")
+            return self.download_manager.link_file(file_path, link_name, reused=True)
             
-            # 验证下载是否成功
-            if downloaded_path and os.path.exists(downloaded_path):
-                actual_size = os.path.getsize(downloaded_path)
-                if actual_size == file_size:
-                    # 添加下载记录
-                    self.download_manager.add_download_record(file_id, downloaded_path, file_size)
+        future = asyncio.get_running_loop().create_future()
+        self._media_in_flight[file_id] = future
+        downloaded_path = None
+        try:
+            downloaded_path = await self._download_new_media(
+                message, file_id, file_size, media_type, original_name, thumb
+            )
+        finally:
+            del self._media_in_flight[file_id]
+            future.set_result(downloaded_path)
+        if downloaded_path:
+            return self.download_manager.link_file(downloaded_path, link_name)
+        return None
+        
+    async def _download_new_media(self, message, file_id, file_size, media_type, original_name, thumb=None):
+        """下载尚未保存过的媒体到 blobs/，成功时返回保存路径
+
+        超过 resumable_threshold 的文档分块下载到 .part 文件，中断后保留已下载的部分，
+        下次重试（包括重启后）从记录的偏移量继续；其余媒体整体下载，不完整时删除重下。
+        thumb 不为空时只下载该尺寸（照片的某个尺寸或文档的缩略图）。
+        """
+        # 获取保存路径
+        file_path = self.download_manager.get_blob_path(file_id, original_name)
+        document = getattr(message, 'document', None)
+        resumable = thumb is None and document is not None and file_size >= self.resumable_threshold
+        
+        # 创建进度回调
+        last_update = [0]
+        start_time = [time.time()]
+        
+        async def progress_callback(received, total):
+            if total:
+                now = time.time()
+                if now - last_update[0] >= 0.5:
+                    percentage = (received / total) * 100
+                    speed = received / (now - start_time[0]) / 1024
                     
-                    # 发送100%进度
                     if self.download_progress_callback:
                         self.download_progress_callback(
                             message.id,
-                            100.0,
-                            0,
+                            percentage,
+                            speed,
                             media_type,
                             os.path.basename(file_path),
-                            file_size,
-                            file_size
+                            received,
+                            total
                         )
-                    return downloaded_path
-                else:
-                    # 下载不完整，删除文件和记录
-                    self.download_manager.remove_download_record(file_id)
-                    print(f"文件下载不完整，将重试: {os.path.basename(file_path)}")
-                    return None
+                    last_update[0] = now
                     
-        except Exception as e:
-            print(f"下载媒体文件失败: {str(e)}")
-            if 'file_id' in locals():
+        try:
+            # 下载文件
+            if resumable:
+                downloaded_path = await self._download_resumable(
+                    document, file_id, file_path, file_size, progress_callback
+                )
+            else:
+                downloaded_path = await message.download_media(
+                    file=file_path,
+                    progress_callback=progress_callback,
+                    thumb=thumb
+                )
+        except FloodWaitError:
+            # 交给重试逻辑按限流器等待
+            raise
+        except Exception:
+            # 分块下载保留 .part 文件和偏移量，其余情况删除不完整的文件
+            if not resumable:
                 self.download_manager.remove_download_record(file_id)
-            return None
+            raise
             
+        # 验证下载是否成功
+        if downloaded_path and os.path.exists(downloaded_path):
+            actual_size = os.path.getsize(downloaded_path)
+            if actual_size == file_size:
+                # 添加下载记录
+                self.download_manager.add_download_record(file_id, downloaded_path, file_size)
+                
+                # 发送100%进度
+                if self.download_progress_callback:
+                    self.download_progress_callback(
+                        message.id,
+                        100.0,
+                        0,
+                        media_type,
+                        os.path.basename(file_path),
+                        file_size,
+                        file_size
+                    )
+                return downloaded_path
+            else:
+                # 下载不完整，删除文件和记录
+                self.download_manager.remove_download_record(file_id)
+                raise Exception(f"文件下载不完整: {os.path.basename(file_path)}")
+        return None
+        
+    def _download_ranges(self, file_size):
+        """把文件切分为按分块对齐的下载范围，超过 parallel_threshold 时切分为 parallel_parts 段"""
+        parts = self.parallel_parts if file_size >= self.parallel_threshold else 1
+        chunk = self.download_chunk_size
+        span = -(-file_size // max(parts, 1))
+        span += (-span) % chunk
+        return [(start, min(start + span, file_size)) for start in range(0, file_size, span)]
+        
+    async def _download_resumable(self, document, file_id, file_path, file_size, progress_callback):
+        """分块下载文档，从上次记录的偏移量继续，完成后将 .part 文件改名为目标文件
+
+        大文件切分为多个范围并发下载，写入同一个 .part 文件的对应位置；每个范围单独记录偏移量，
+        任一范围中断时其他范围已下载的部分同样保留。
+        """
+        part_path = file_path + ".part"
+        ranges = self._download_ranges(file_size)
+        if not os.path.exists(part_path):
+            with open(part_path, 'wb') as f:
+                f.truncate(file_size)
+        received = [0] * len(ranges)
+        
+        async def fetch_range(index, start, end):
+            # 单个范围沿用文件ID作为记录键，多个范围时按序号和段数区分
+            key = file_id if len(ranges) == 1 else f"{file_id}#{index}/{len(ranges)}"
+            offset = start
+            partial = self.download_manager.get_partial(key)
+            if partial:
+                # 只信任已记录且已写入磁盘的部分，并对齐到分块边界
+                offset = max(start, min(partial['offset'], end))
+                offset -= (offset - start) % self.download_chunk_size
+            if offset > start and index == 0:
+                print(f"从已保存的进度继续下载: {os.path.basename(file_path)}")
+            received[index] = offset - start
+            if offset >= end:
+                return
+                
+            synced = offset
+            with open(part_path, 'r+b') as f:
+                f.seek(offset)
+                try:
+                    async for chunk in self.client.iter_download(
+                        document,
+                        offset=offset,
+                        limit=-(-(end - offset) // self.download_chunk_size),
+                        request_size=self.download_chunk_size,
+                        file_size=file_size
+                    ):
+                        chunk = chunk[:end - offset]
+                        f.write(chunk)
+                        offset += len(chunk)
+                        received[index] = offset - start
+                        if offset - synced >= self.partial_sync_bytes:
+                            f.flush()
+                            os.fsync(f.fileno())
+                            self.download_manager.save_partial(key, part_path, offset, file_size)
+                            synced = offset
+                        await progress_callback(sum(received), file_size)
+                        if offset >= end:
+                            break
+                finally:
+                    # 中断时也记录已写入的部分
+                    f.flush()
+                    os.fsync(f.fileno())
+                    self.download_manager.save_partial(key, part_path, offset, file_size)
+            if offset < end:
+                raise Exception(f"下载中断，第 {index + 1} 段已保存 {offset - start}/{end - start} 字节")
+                
+        results = await asyncio.gather(
+            *(fetch_range(index, start, end) for index, (start, end) in enumerate(ranges)),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+                
+        os.replace(part_path, file_path)
+        if len(ranges) == 1:
+            self.download_manager.remove_partial(file_id)
+        else:
+            for index in range(len(ranges)):
+                self.download_manager.remove_partial(f"{file_id}#{index}/{len(ranges)}")
+        return file_path
+        
     async def _process_group_id(self, group_id):
         """处理不同格式的群组ID"""
         try:
@@ -171,7 +401,7 @@ class TelegramCrawler:
                 
             # 尝试直接获取实体
             try:
-                entity = await self.client.get_entity(group_id)
+                entity = await self.rate_limiter.call('entity', self.client.get_entity, group_id)
                 return entity
             except ValueError:
                 # 如果直接获取失败，尝试其他方式
@@ -204,33 +434,100 @@ class TelegramCrawler:
                 
         raise Exception("无法连接到Telegram服务器，请检查网络和代理设置")
         
+    def _user_info_from_entity(self, user, user_id):
+        """根据用户或频道实体生成发送者信息"""
+        user_info = {
+            'username': getattr(user, 'username', '') or '',
+            'first_name': '',
+            'last_name': '',
+            'display_name': ''
+        }
+        
+        # 处理不同类型的发送者
+        if hasattr(user, 'title'):  # 如果是频道或群组
+            user_info['display_name'] = user.title
+        else:  # 如果是用户
+            user_info['first_name'] = getattr(user, 'first_name', '') or ''
+            user_info['last_name'] = getattr(user, 'last_name', '') or ''
+            if user.username:
+                user_info['display_name'] = f"@{user.username}"
+            else:
+                full_name = ' '.join(filter(None, [user_info['first_name'], user_info['last_name']]))
+                user_info['display_name'] = full_name or f"User{user_id}"
+        return user_info
+        
+    async def _resolve_senders(self, messages):
+        """批量解析一批消息的发送者
+
+        优先使用 GetHistory 响应中附带的用户/频道实体（message.sender），
+        剩余未知的用户再按每批最多 100 个调用 users.getUsers，
+        避免对每个发送者单独调用 get_entity。返回 {user_id: 发送者信息}。
+        """
+        resolved = {}
+        fetched = {}
+        missing = set()
+        for message in messages:
+            user_id = message.sender_id
+            if user_id is None or user_id in resolved or user_id in missing:
+                continue
+            user_info = self.users_cache.get(user_id)
+            if user_info is None:
+                sender = getattr(message, 'sender', None)
+                if sender is not None and not getattr(sender, 'min', False):
+                    user_info = self._user_info_from_entity(sender, user_id)
+                    fetched[user_id] = user_info
+            if user_info is not None:
+                resolved[user_id] = user_info
+            elif user_id > 0:
+                missing.add(user_id)
+                
+        if missing:
+            fetched.update(await self._get_users_batch(list(missing)))
+            
+        self.users_cache.set_many(fetched)
+        resolved.update(fetched)
+        return resolved
+            
+    async def _get_users_batch(self, user_ids):
+        """通过 users.getUsers 批量获取用户信息，每次最多 100 个"""
+        result = {}
+        input_users = []
+        for user_id in user_ids:
+            try:
+                # 从会话缓存中取 access_hash，通常不需要网络请求
+                input_users.append(utils.get_input_user(await self.client.get_input_entity(user_id)))
+            except Exception as e:
+                print(f"无法获取发送者 {user_id} 的访问凭据: {str(e)}")
+                
+        for i in range(0, len(input_users), self.users_batch_size):
+            batch = input_users[i:i + self.users_batch_size]
+            try:
+                users = await self.rate_limiter.call('entity', self.client, functions.users.GetUsersRequest(id=batch))
+            except Exception as e:
+                print(f"批量获取 {len(batch)} 个发送者信息失败: {str(e)}")
+                continue
+            for user in users:
+                result[user.id] = self._user_info_from_entity(user, user.id)
+        return result
+                
     async def _get_user_info(self, user_id):
         """获取用户信息"""
-        if user_id in self.users_cache:
-            return self.users_cache[user_id]
-            
-        try:
-            user = await self.client.get_entity(user_id)
-            user_info = {
-                'username': getattr(user, 'username', ''),
+        if user_id is None:
+            return {
+                'username': '',
                 'first_name': '',
                 'last_name': '',
-                'display_name': ''
+                'display_name': '匿名'
             }
             
-            # 处理不同类型的发送者
-            if hasattr(user, 'title'):  # 如果是频道或群组
-                user_info['display_name'] = user.title
-            else:  # 如果是用户
-                user_info['first_name'] = getattr(user, 'first_name', '')
-                user_info['last_name'] = getattr(user, 'last_name', '')
-                if user.username:
-                    user_info['display_name'] = f"@{user.username}"
-                else:
-                    full_name = ' '.join(filter(None, [user_info['first_name'], user_info['last_name']]))
-                    user_info['display_name'] = full_name or f"User{user_id}"
-                    
-            self.users_cache[user_id] = user_info
+        try:
+            user_info = self.users_cache.get(user_id)
+            if user_info is not None:
+                return user_info
+                
+            user = await self.rate_limiter.call('entity', self.client.get_entity, user_id)
+            user_info = self._user_info_from_entity(user, user_id)
+            self.users_cache.set(user_id, user_info)
             return user_info
         except Exception as e:
             print(f"获取发送者 {user_id} 信息失败: {str(e)}")
@@ -241,217 +538,723 @@ class TelegramCrawler:
                 'display_name': f"Unknown{user_id}"
             }
             
-    async def start_crawling(self, group_id, start_date, progress_callback=None, download_progress_callback=None, limit=None, resume=False):
-        """开始爬取消息"""
-        self.download_progress_callback = download_progress_callback
+    async def _next_batch(self, queue):
+        """从队列取出一批已就绪的消息，返回 (消息列表, 是否已结束)"""
+        message = await queue.get()
+        batch = []
+        while message is not None:
+            batch.append(message)
+            if len(batch) >= self.users_batch_size or queue.empty():
+                break
+            message = queue.get_nowait()
+        return batch, message is None
+        
+    def _to_utc(self, date):
+        """确保时间带有时区信息"""
+        if date and date.tzinfo is None:
+            return date.replace(tzinfo=timezone.utc)
+        return date
+        
+    def _iter_kwargs(self, from_date, to_date, reverse, offset_id=None, min_id=None, max_id=None):
+        """生成 iter_messages 的定位参数
+
+        从新到旧时从 to_date 开始向前翻页；从旧到新 (reverse) 时从 from_date 开始向后翻页。
+        min_id/max_id 限定消息ID范围（不含两端）；从旧到新且没有其他起点时从 min_id 之后开始，
+        不必从群组最早的消息翻起。
+        """
+        kwargs = {'reverse': reverse}
+        offset_date = from_date if reverse else to_date
+        if offset_date:
+            kwargs['offset_date'] = offset_date
+        if reverse and min_id and not offset_id and not offset_date:
+            offset_id = min_id
+        if offset_id:
+            kwargs['offset_id'] = offset_id
+        if min_id:
+            kwargs['min_id'] = min_id
+        if max_id:
+            kwargs['max_id'] = max_id
+        return kwargs
+        
+    async def _estimate_total(self, entity, from_date, to_date, limit, min_id=None, max_id=None):
+        """估算时间窗口内的消息数量，仅用于计算进度"""
+        if limit:
+            return limit
+        if max_id:
+            return max(max_id - (min_id or 0) - 1, 1)
+        if min_id and not from_date and not to_date:
+            # 只需要 min_id 之后的新消息，用最新消息的ID估算
+            latest = await self.rate_limiter.call('history', self.client.get_messages, entity, limit=1)
+            return max((latest[0].id if latest else 0) - min_id, 1)
+        if from_date:
+            # 用窗口两端的消息ID之差估算，只需两次请求
+            upper = await self.rate_limiter.call('history', self.client.get_messages, entity, limit=1, offset_date=to_date)
+            lower = await self.rate_limiter.call('history', self.client.get_messages, entity, limit=1, offset_date=from_date)
+            upper_id = upper[0].id if upper else 0
+            lower_id = lower[0].id if lower else 0
+            return max(upper_id - lower_id, 1)
+        kwargs = {'offset_date': to_date} if to_date else {}
+        return (await self.rate_limiter.call('history', self.client.get_messages, entity, limit=0, **kwargs)).total
+        
+    async def _fetch_messages(self, entity, queue, limit, from_date=None, to_date=None, **kwargs):
+        """生产者：分页拉取消息并放入有界队列，结束时放入 None
+
+        越过时间窗口的另一端时立即停止翻页，不再请求更早（或更晚）的历史。
+        按页调用 iter_messages（每次最多 history_page_size 条，对应一次请求），请求前向限流器
+        申请令牌，该页完整返回后才计为成功；从最后一条消息处继续翻页，直到返回空页。
+        遇到 FloodWait 时等待后从最后一条消息处继续。
+        """
+        reverse = kwargs.get('reverse', False)
+        fetched = 0
         try:
-            # 初始化客户端
-            print(f"使用代理配置: {self.proxy}")
-            self.client = TelegramClient(
-                'anon',
-                self.api_id,
-                self.api_hash,
-                proxy=self.proxy,
-                connection=ConnectionTcpFull,  # 使用完整TCP连接
-                connection_retries=5,
-                retry_delay=2,
-                timeout=60,  # 增加超时时间
-                auto_reconnect=True  # 启用自动重连
-            )
+            finished = False
+            while not finished:
+                page_limit = min(self.history_page_size, limit - fetched) if limit else self.history_page_size
+                if page_limit <= 0:
+                    break
+                await self.rate_limiter.acquire('history')
+                received = 0
+                try:
+                    async for message in self.client.iter_messages(
+                        entity,
+                        limit=page_limit,
+                        wait_time=0,  # 翻页间隔由限流器控制
+                        **kwargs
+                    ):
+                        received += 1
+                        message_date = self._to_utc(message.date)
+                        if reverse and to_date and message_date > to_date:
+                            finished = True
+                            break
+                        if not reverse and from_date and message_date < from_date:
+                            finished = True
+                            break
+                            
+                        # 队列已满时等待消费者处理，避免整段历史堆积在内存中
+                        await queue.put(message)
+                        fetched += 1
+                        kwargs['offset_id'] = message.id
+                except FloodWaitError as e:
+                    await self.rate_limiter.on_flood_wait('history', e.seconds)
+                else:
+                    self.rate_limiter.on_success('history')
+                    # 已删除或无权访问的消息会让页面少于 page_limit 条，只有空页才表示没有更多历史
+                    if received == 0:
+                        finished = True
+                # 之后的页从最后收到的消息处继续
+                if 'offset_id' in kwargs:
+                    kwargs.pop('offset_date', None)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # 通知消费者结束，异常由等待该任务的一方重新抛出
+            await queue.put(None)
+            raise
+        await queue.put(None)
             
-            # 设置回调函数
-            if self.phone_code_callback:
-                self.client.phone_code_callback = self.phone_code_callback
+    async def _process_message(self, message, group_id, user_info=None, media_callback=None, download_tasks=None):
+        """消费者：将单条消息转换为数据行
+
+        含媒体的消息立即返回 media_status 为 pending 的数据行，媒体交给下载池在后台下载，
+        完成后回填 media_path 并调用 media_callback(message_data)。
+        media_mode 为 'metadata' 时不下载，只记录媒体的大小、文件名和ID，media_status 为
+        deferred，并登记到 media_queue；满足 media_rule 的媒体直接排队，状态为 queued。
+        media_policy 不允许下载的媒体 media_status 为 skipped（metadata 模式下不自动排队）。
+        """
+        # 获取发送者信息
+        if user_info is None:
+            user_info = await self._get_user_info(message.sender_id)
+        
+        # 确保消息时间带有时区信息
+        message_date = self._to_utc(message.date)
+            
+        media_type = self._get_media_type(message)
+        message_data = {
+            'id': message.id,
+            'group': group_id,
+            'sender_id': message.sender_id,
+            'username': user_info['username'],
+            'sender_name': user_info['display_name'],
+            'date': message_date,
+            'text': message.text or '',
+            'views': getattr(message, 'views', 0),
+            'media_type': media_type,
+            'media_path': None,
+            'media_status': 'pending' if message.media else None,
+            'media_size': None,
+            'media_name': None,
+            'media_key': None
+        }
+        
+        if message.media:
+            message_data['media_size'] = self._media_size(message)
+            message_data['media_name'] = getattr(getattr(message, 'file', None), 'name', None)
+            message_data['media_key'] = self._media_key(message)
+            
+        if message.media and self.media_mode == 'metadata':
+            queued = bool(self.media_rule and self.media_rule(message_data))
+            queued = queued and self._media_allowed(message, group_id, media_type)
+            message_data['media_status'] = 'queued' if queued else 'deferred'
+            if self.media_queue:
+                self.media_queue.add(message_data, queued)
+        elif message.media and not self._media_allowed(message, group_id, media_type):
+            message_data['media_status'] = 'skipped'
+        elif message.media:
+            def on_done(path):
+                message_data['media_path'] = path
+                message_data['media_status'] = 'done' if path else 'failed'
+                if media_callback:
+                    media_callback(message_data)
+                    
+            task = await self.download_pool.submit(message, media_type, on_done)
+            if download_tasks is not None:
+                download_tasks.add(task)
+                task.add_done_callback(download_tasks.discard)
+            
+        return message_data
+            
+    async def connect(self):
+        """创建客户端并完成连接与身份验证"""
+        # 初始化客户端
+        print(f"使用代理配置: {self.proxy}")
+        self.client = TelegramClient(
+            self.session_name,
+            self.api_id,
+            self.api_hash,
+            proxy=self.proxy,
+            connection=ConnectionTcpFull,  # 使用完整TCP连接
+            connection_retries=5,
+            retry_delay=2,
+            timeout=60,  # 增加超时时间
+            auto_reconnect=True,  # 启用自动重连
+            flood_sleep_threshold=0  # FloodWait 统一交给限流器处理
+        )
+        
+        # 设置回调函数
+        if self.phone_code_callback:
+            self.client.phone_code_callback = self.phone_code_callback
+            
+        # 连接到Telegram
+        try:
+            print("正在连接到Telegram...")
+            if not await self._ensure_connected():
+                print("需要进行身份验证...")
+                phone = await self.phone_code_callback()
+                if not phone:
+                    raise Exception("未提供电话号码")
+                    
+                await self.client.send_code_request(phone)
+                code = await self.code_callback()
+                if not code:
+                    raise Exception("未提供验证码")
+                    
+                try:
+                    await self.client.sign_in(phone, code)
+                except SessionPasswordNeededError:
+                    raise Exception("需要两步验证密码")
+                    
+            print("认证成功，正在获取群组信息...")
+            
+        except ServerError as e:
+            raise Exception(f"服务器错误: {str(e)}\n请稍后重试")
+        except Exception as e:
+            raise Exception(f"连接Telegram失败: {str(e)}\n请检查网络连接或代理设置")
+            
+    async def _get_group_entity(self, group_id):
+        """解析群组ID并获取群组实体"""
+        # 处理群组ID
+        processed_id = await self._process_group_id(group_id)
+        if not processed_id:
+            raise Exception("无法处理群组ID，请确保格式正确")
+            
+        # 获取群组信息
+        try:
+            print(f"尝试获取群组信息...")
+            if isinstance(processed_id, (PeerChannel, int)):
+                entity = await self.rate_limiter.call('entity', self.client.get_entity, processed_id)
+            else:
+                entity = processed_id
                 
-            # 连接到Telegram
-            try:
-                print("正在连接到Telegram...")
-                if not await self._ensure_connected():
-                    print("需要进行身份验证...")
-                    phone = await self.phone_code_callback()
-                    if not phone:
-                        raise Exception("未提供电话号码")
-                        
-                    await self.client.send_code_request(phone)
-                    code = await self.code_callback()
-                    if not code:
-                        raise Exception("未提供验证码")
-                        
-                    try:
-                        await self.client.sign_in(phone, code)
-                    except SessionPasswordNeededError:
-                        raise Exception("需要两步验证密码")
-                        
-                print("认证成功，正在获取群组信息...")
+            print(f"成功获取群组信息: {entity.title if hasattr(entity, 'title') else '未知群组'}")
+            return entity
+        except ValueError as e:
+            raise Exception(f"无法获取群组信息: {str(e)}\n请确保：\n1. 群组ID正确\n2. 您已经加入该群组\n3. 您有权限访问该群组")
+        except Exception as e:
+            raise Exception(f"获取群组信息失败: {str(e)}")
+            
+    def _start_run(self, download_progress_callback, parquet_dir):
+        """初始化一次爬取共用的下载池和 Parquet 写入器"""
+        self.download_progress_callback = download_progress_callback
+        self.download_pool = MediaDownloadPool(
+            self._download_media_with_retry,
+            max_concurrent=self.max_concurrent_downloads,
+            type_limits=self.media_type_limits
+        )
+        # 初始化消息列表
+        self.messages = []
+        # 同时流式写出 Parquet
+        self.parquet_writer = ParquetWriter(parquet_dir) if parquet_dir else None
+        
+    async def _finish_run(self):
+        """取消未完成的下载并释放连接"""
+        if self.download_pool:
+            await self.download_pool.cancel()
+        self.download_manager.flush()
+        if self.media_queue:
+            self.media_queue.flush()
+        if self.parquet_writer:
+            self.parquet_writer.close()
+            self.parquet_writer = None
+        if self.client:
+            await self.client.disconnect()
+            
+    def _load_saved_messages(self, group_id, progress_key, progress_info, min_id=None, max_id=None):
+        """继续爬取时加载已保存的消息
+
+        进度按 progress_key 保存，消息按群组保存；分片爬取时只取本范围 (min_id, max_id) 内的消息。
+        """
+        if 'data_file' in progress_info:
+            # 旧版整体快照格式，消息与进度保存在一起
+            progress_data = self.data_processor.load_progress(progress_key)
+            return progress_data[1] if progress_data else []
+        return [
+            row for row in self.data_processor.load_messages(group_id)
+            if (min_id is None or row['id'] > min_id) and (max_id is None or row['id'] < max_id)
+        ]
+        
+    async def _crawl_group(self, group_id, entity, start_date, progress_callback=None, limit=None, resume=False,
+                           message_callback=None, keep_messages=True, media_callback=None, from_date=None, reverse=False,
+                           min_id=None, max_id=None, progress_key=None, allow_empty=False):
+        """在已连接的客户端上爬取单个群组，返回处理的消息数
+
+        min_id/max_id 只爬取该ID范围内的消息；多个范围并行爬取同一群组时，
+        用不同的 progress_key 分别保存各自的进度。allow_empty 为 True 时
+        没有符合条件的消息不视为错误（用于同步新消息）。
+        """
+        progress_key = progress_key or group_id
+        # 将输入的时间转换为带时区的时间
+        start_date = self._to_utc(start_date)
+        from_date = self._to_utc(from_date)
+        if start_date and from_date and from_date > start_date:
+            raise Exception("最早时间不能晚于起始时间")
+            
+        # 检查是否有上次的进度
+        progress_info = None
+        last_message_id = None
+        if resume:
+            # 只需要从存储中读取进度；需要完整结果时才加载已保存的消息
+            progress_info = self.data_processor.load_progress_info(progress_key)
+            if progress_info:
+                last_message_id = progress_info.get('last_message_id')
+                print(f"[{group_id}] 找到上次进度：已爬取 {self.data_processor.count_messages(group_id)} 条消息")
+                if keep_messages:
+                    self.messages.extend(self._load_saved_messages(group_id, progress_key, progress_info, min_id, max_id))
                 
-            except ServerError as e:
-                raise Exception(f"服务器错误: {str(e)}\n请稍后重试")
-            except Exception as e:
-                raise Exception(f"连接Telegram失败: {str(e)}\n请检查网络连接或代理设置")
+        # 上次检查点之后新增或更新的消息行，检查点只追加写入这些行
+        checkpoint_rows = []
+        # 本群组提交的下载任务，群组结束前等待其完成
+        download_tasks = set()
+        
+        def on_media_done(message_data):
+            checkpoint_rows.append(message_data)
+            if media_callback:
+                media_callback(message_data)
                 
-            # 处理群组ID
-            processed_id = await self._process_group_id(group_id)
-            if not processed_id:
-                raise Exception("无法处理群组ID，请确保格式正确")
+        # 获取消息
+        try:
+            print(f"[{group_id}] 正在定位消息...")
+            kwargs = self._iter_kwargs(from_date, start_date, reverse, last_message_id, min_id, max_id)
                 
-            # 获取群组信息
-            try:
-                print(f"尝试获取群组信息...")
-                if isinstance(processed_id, (PeerChannel, int)):
-                    entity = await self.client.get_entity(processed_id)
-                else:
-                    entity = processed_id
-                    
-                print(f"成功获取群组信息: {entity.title if hasattr(entity, 'title') else '未知群组'}")
-            except ValueError as e:
-                raise Exception(f"无法获取群组信息: {str(e)}\n请确保：\n1. 群组ID正确\n2. 您已经加入该群组\n3. 您有权限访问该群组")
-            except Exception as e:
-                raise Exception(f"获取群组信息失败: {str(e)}")
+            # 估算本次需要处理的消息数量，用于计算进度
+            estimated_total = await self._estimate_total(entity, from_date, start_date, limit, min_id, max_id)
                 
-            # 初始化消息列表
-            self.messages = []
-            
-            # 将输入的时间转换为带时区的时间
-            if start_date and start_date.tzinfo is None:
-                start_date = start_date.replace(tzinfo=timezone.utc)
-            
-            # 检查是否有上次的进度
-            progress_info = None
-            last_message_id = None
-            if resume:
-                progress_data = self.data_processor.load_progress(group_id)
-                if progress_data:
-                    progress_info, self.messages = progress_data
-                    if progress_info and 'last_message_id' in progress_info:
-                        last_message_id = progress_info['last_message_id']
-                    print(f"找到上次进度：已爬取 {len(self.messages)} 条消息")
-                    
-            # 获取消息
+            # 生产者分页拉取消息，消费者边拉取边处理，队列有界保证内存占用平稳
+            queue = asyncio.Queue(maxsize=self.queue_size)
+            producer = asyncio.create_task(
+                self._fetch_messages(entity, queue, limit, from_date, start_date, **kwargs)
+            )
+            
+            processed_messages = 0
             try:
-                total_messages = 0
-                found_start_date = False
-                temp_messages = []
-                
-                print(f"正在定位消息...")
-                kwargs = {}
-                if start_date:
-                    kwargs['offset_date'] = start_date
-                if last_message_id:
-                    kwargs['offset_id'] = last_message_id
-                    
-                async for message in self.client.iter_messages(entity, **kwargs):
-                    # 如果没有指定起始时间，直接收集消息
-                    if not start_date:
-                        found_start_date = True
-                        temp_messages.append(message)
-                        total_messages += 1
-                    else:
-                        # 确保消息时间也是带时区的
-                        message_date = message.date
-                        if message_date.tzinfo is None:
-                            message_date = message_date.replace(tzinfo=timezone.utc)
-                        
-                        if message_date <= start_date:
-                            found_start_date = True
-                            temp_messages.append(message)
-                            total_messages += 1
-                    
-                    if progress_callback:
-                        progress_callback(0, f"正在统计消息: {total_messages}")
-                    
-                    # 如果设置了数量限制，达到后就停止
-                    if limit and total_messages >= limit:
-                        break
-                        
-                if total_messages == 0:
-                    raise Exception("未找到符合条件的消息")
+                finished = False
+                while not finished:
+                    batch, finished = await self._next_batch(queue)
+                    senders = await self._resolve_senders(batch)
                     
-                # 显示实际要爬取的消息数量
-                actual_limit = min(limit, total_messages) if limit else total_messages
-                print(f"找到 {actual_limit} 条消息")
-                
-                # 处理已获取的消息
-                processed_messages = 0
-                for message in temp_messages[:actual_limit]:
-                    try:
-                        # 获取发送者信息
-                        user_info = await self._get_user_info(message.sender_id)
-                        
-                        # 更新消息处理进度
-                        if progress_callback:
-                            progress = (processed_messages / actual_limit) * 100
-                            status_text = (
-                                f"正在处理消息 {processed_messages + 1}/{actual_limit}\n"
-                                f"发送者: {user_info['display_name']}\n"
-                                f"时间: {message.date.strftime('%Y-%m-%d %H:%M:%S')}\n"
-                                f"类型: {'含媒体文件' if message.media else '纯文本'}"
+                    for message in batch:
+                        try:
+                            message_data = await self._process_message(
+                                message, group_id, senders.get(message.sender_id), on_media_done, download_tasks
                             )
-                            progress_callback(progress, status_text)
-                        
-                        # 确保消息时间带有时区信息
-                        message_date = message.date
-                        if message_date.tzinfo is None:
-                            message_date = message_date.replace(tzinfo=timezone.utc)
-                        
-                        message_data = {
-                            'id': message.id,
-                            'group': group_id,
-                            'sender_id': message.sender_id,
-                            'username': user_info['username'],
-                            'sender_name': user_info['display_name'],
-                            'date': message_date,
-                            'text': message.text or '',
-                            'views': getattr(message, 'views', 0),
-                            'media_type': self._get_media_type(message),
-                            'media_path': await self._download_media_with_retry(message) if message.media else None
-                        }
-                        self.messages.append(message_data)
-                        
+                        except Exception as e:
+                            print(f"处理消息 {message.id} 时出错: {str(e)}")
+                            continue
+                            
+                        checkpoint_rows.append(message_data)
+                        if self.stats:
+                            self.stats.add(message_data)
+                        if self.parquet_writer:
+                            self.parquet_writer.write([message_data])
+                        if keep_messages:
+                            self.messages.append(message_data)
+                        if message_callback:
+                            message_callback(message_data)
+                            
                         # 更新进度
                         processed_messages += 1
                         if progress_callback:
-                            progress = (processed_messages / actual_limit) * 100
-                            progress_callback(progress, f"已处理 {processed_messages}/{actual_limit} 条消息")
+                            progress = min(processed_messages / max(estimated_total, 1) * 100, 99)
+                            status_text = (
+                                f"已处理 {processed_messages}/{estimated_total} 条消息\n"
+                                f"发送者: {message_data['sender_name']}\n"
+                                f"时间: {message_data['date'].strftime('%Y-%m-%d %H:%M:%S')}\n"
+                                f"类型: {'含媒体文件' if message.media else '纯文本'}\n"
+                                f"请求速率: {self.rate_limiter.format_rates()}"
+                            )
+                            progress_callback(progress, status_text)
                             
-                        # 每处理10条消息暂停一下，避免请求过于频繁
-                        if processed_messages % 10 == 0:
-                            await asyncio.sleep(0.5)
+                        last_message_id = message.id
                             
                         # 定期保存进度
                         if processed_messages % 100 == 0:
                             self.data_processor.save_progress(
-                                group_id,
-                                self.messages,
+                                progress_key,
+                                checkpoint_rows,
                                 last_message_id=message.id,
                                 start_date=start_date
                             )
-                    except Exception as e:
-                        print(f"处理消息 {message.id} 时出错: {str(e)}")
-                        continue
+                            checkpoint_rows = []
+            finally:
+                if not producer.done():
+                    producer.cancel()
+                    
+            # 抛出生产者中发生的异常
+            await producer
                 
-            except FloodWaitError as e:
-                raise Exception(f"请求过于频繁，需要等待 {e.seconds} 秒")
-            except Exception as e:
-                # 发生错误时保存进度
-                if self.messages:
-                    self.data_processor.save_progress(
-                        group_id,
-                        self.messages,
-                        last_message_id=last_message_id,
-                        start_date=start_date
-                    )
-                raise e
+            if processed_messages == 0 and not allow_empty:
+                raise Exception("未找到符合条件的消息")
+                
+            # 等待本群组的后台媒体下载全部完成
+            if download_tasks:
+                print(f"[{group_id}] 等待 {len(download_tasks)} 个媒体文件下载完成...")
+                if progress_callback:
+                    progress_callback(99, f"等待 {len(download_tasks)} 个媒体文件下载完成...")
+                await asyncio.gather(*list(download_tasks), return_exceptions=True)
+            
+            # 保存最后一批消息及下载完成后更新的消息
+            self.data_processor.save_progress(
+                progress_key,
+                checkpoint_rows,
+                last_message_id=last_message_id,
+                start_date=start_date
+            )
+            checkpoint_rows = []
                 
+            print(f"[{group_id}] 共处理 {processed_messages} 条消息")
+            if progress_callback:
+                progress_callback(100, f"已处理 {processed_messages} 条消息")
+            return processed_messages
+            
+        except FloodWaitError as e:
+            raise Exception(f"请求过于频繁，需要等待 {e.seconds} 秒")
+        except Exception as e:
+            # 发生错误时保存进度
+            if checkpoint_rows:
+                self.data_processor.save_progress(
+                    progress_key,
+                    checkpoint_rows,
+                    last_message_id=last_message_id,
+                    start_date=start_date
+                )
+            raise e
+            
+    def _print_run_summary(self):
+        """输出限流与缓存统计"""
+        print(f"当前请求速率: {self.rate_limiter.format_rates()}")
+        cache_stats = self.users_cache.stats()
+        print(f"发送者缓存命中 {cache_stats['hits']} 次，未命中 {cache_stats['misses']} 次")
+        if self.download_manager.dedup_hits:
+            print(f"重复媒体复用已下载文件 {self.download_manager.dedup_hits} 次")
+        if self.media_policy and self.media_policy.skipped:
+            print(f"媒体策略跳过 {self.media_policy.skipped} 个媒体")
+        
+    async def start_crawling(self, group_id, start_date, progress_callback=None, download_progress_callback=None, limit=None, resume=False,
+                             message_callback=None, keep_messages=True, media_callback=None, from_date=None, reverse=False,
+                             parquet_dir=None):
+        """开始爬取消息
+
+        爬取 [from_date, start_date] 时间窗口内的消息，两端均可为空。默认从新到旧，
+        reverse 为 True 时从旧到新；越过窗口边界后立即停止翻页。
+        指定 parquet_dir 时，处理完的消息同时流式写入按群组和日期分区的 Parquet 文件，
+        其中媒体列为写入时的状态。
+        消息以流水线方式处理：拉取协程持续翻页，处理协程逐条解析，
+        每处理完一条即通过 message_callback 输出。keep_messages 为 False 时
+        不在内存中保留消息列表。媒体在下载池中并发下载，下载完成时
+        通过 media_callback 输出更新后的数据行。
+        """
+        self._start_run(download_progress_callback, parquet_dir)
+        try:
+            await self.connect()
+            entity = await self._get_group_entity(group_id)
+            await self._crawl_group(
+                group_id, entity, start_date,
+                progress_callback=progress_callback,
+                limit=limit,
+                resume=resume,
+                message_callback=message_callback,
+                keep_messages=keep_messages,
+                media_callback=media_callback,
+                from_date=from_date,
+                reverse=reverse
+            )
+            self._print_run_summary()
+        except Exception as e:
+            raise Exception(f"爬取失败: {str(e)}")
+        finally:
+            await self._finish_run()
+            
+    async def crawl_groups(self, group_ids, start_date, progress_callback=None, download_progress_callback=None,
+                           group_progress_callback=None, max_concurrent_groups=None, parquet_dir=None,
+                           group_kwargs=None, **kwargs):
+        """用同一个客户端并发爬取多个群组
+
+        最多同时爬取 max_concurrent_groups 个群组，所有群组共享限流器和下载池，
+        各群组独立保存检查点。group_progress_callback(group_id, progress, text) 报告
+        单个群组的进度，progress_callback 报告整体完成情况。group_kwargs(group_id)
+        可返回该群组单独使用的参数。其余参数与 start_crawling 相同。
+        返回 {group_id: 处理的消息数或异常}，单个群组失败不影响其他群组。
+        """
+        group_ids = list(dict.fromkeys(group_ids))
+        semaphore = asyncio.Semaphore(max_concurrent_groups or self.max_concurrent_groups)
+        results = {}
+        
+        async def crawl_one(group_id):
+            async with semaphore:
+                group_callback = None
+                if group_progress_callback:
+                    group_callback = lambda progress, text: group_progress_callback(group_id, progress, text)
+                try:
+                    entity = await self._get_group_entity(group_id)
+                    group_options = {**kwargs, **(group_kwargs(group_id) if group_kwargs else {})}
+                    results[group_id] = await self._crawl_group(
+                        group_id, entity, start_date, progress_callback=group_callback, **group_options
+                    )
+                except Exception as e:
+                    print(f"[{group_id}] 爬取失败: {str(e)}")
+                    results[group_id] = e
+                if progress_callback:
+                    progress_callback(
+                        len(results) / len(group_ids) * 100,
+                        f"已完成 {len(results)}/{len(group_ids)} 个群组"
+                    )
+                    
+        self._start_run(download_progress_callback, parquet_dir)
+        try:
+            await self.connect()
+            await asyncio.gather(*(crawl_one(group_id) for group_id in group_ids))
+            self._print_run_summary()
         except Exception as e:
             raise Exception(f"爬取失败: {str(e)}")
         finally:
-            if self.client:
-                await self.client.disconnect()
+            await self._finish_run()
+            
+        if all(isinstance(result, Exception) for result in results.values()):
+            raise Exception(f"爬取失败: 所有群组均未成功")
+        return results
+            
+    async def sync_groups(self, group_ids, progress_callback=None, download_progress_callback=None, **kwargs):
+        """增量同步多个群组自上次保存以来的新消息
+
+        读取每个群组已保存的最大消息ID，只请求比它更新的消息 (min_id)，按从旧到新的顺序
+        拉取并合并到同一存储中；没有新消息时只需一两次请求。没有已保存消息的群组从最早的
+        消息开始爬取。同步进度单独保存，不影响继续上次采集。
+        其余参数与 crawl_groups 相同，返回 {group_id: 新处理的消息数或异常}。
+        """
+        def sync_kwargs(group_id):
+            return {
+                'min_id': self.data_processor.get_max_message_id(group_id) or None,
+                'progress_key': f"{group_id}#sync"
+            }
             
+        kwargs.setdefault('keep_messages', False)
+        return await self.crawl_groups(
+            group_ids, None, progress_callback, download_progress_callback,
+            group_kwargs=sync_kwargs, reverse=True, allow_empty=True, **kwargs
+        )
+        
+    async def listen(self, group_ids, stop_event=None, flush_size=100, flush_interval=5.0, message_callback=None,
+                     media_callback=None, download_progress_callback=None, flush_callback=None, parquet_dir=None):
+        """实时模式：订阅群组的新消息和编辑事件，直到 stop_event 被设置或连接断开
+
+        收到的消息先放入缓冲区，累计 flush_size 条或距上次写入超过 flush_interval 秒时，
+        批量解析发送者并写入消息存储；编辑后的消息按 (group, id) 覆盖原记录。发送者缓存、
+        下载池和 Parquet 写入与 start_crawling 相同，媒体下载完成后的数据行在下一批中写入。
+        flush_callback(rows) 在每批写入后调用。不会拉取历史消息，断开期间的消息可用 sync_groups 补齐。
+        """
+        group_ids = list(dict.fromkeys(group_ids))
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        # 下载完成后更新的数据行，下一批一起写入
+        media_rows = []
+        
+        def on_media_done(message_data):
+            media_rows.append(message_data)
+            if media_callback:
+                media_callback(message_data)
+                
+        async def flush(messages):
+            senders = await self._resolve_senders([message for _, message in messages])
+            rows = []
+            for group_id, message in messages:
+                try:
+                    rows.append(await self._process_message(
+                        message, group_id, senders.get(message.sender_id), on_media_done
+                    ))
+                except Exception as e:
+                    print(f"处理消息 {message.id} 时出错: {str(e)}")
+            rows.extend(media_rows)
+            media_rows.clear()
+            if not rows:
+                return
+            self.data_processor.upsert_messages(rows)
+            if self.parquet_writer:
+                self.parquet_writer.write(rows)
+            if message_callback:
+                for row in rows:
+                    message_callback(row)
+            if flush_callback:
+                flush_callback(rows)
+                
+        self._start_run(download_progress_callback, parquet_dir)
+        try:
+            await self.connect()
+            chats = {}  # peer_id -> 用户输入的群组ID
+            for group_id in group_ids:
+                entity = await self._get_group_entity(group_id)
+                chats[utils.get_peer_id(entity)] = group_id
+                
+            async def on_message(event):
+                group_id = chats.get(event.chat_id)
+                if group_id is not None:
+                    # 缓冲区已满时等待写入，避免突发消息占满内存
+                    await queue.put((group_id, event.message))
+                    
+            chat_ids = list(chats)
+            self.client.add_event_handler(on_message, events.NewMessage(chats=chat_ids))
+            self.client.add_event_handler(on_message, events.MessageEdited(chats=chat_ids))
+            print(f"正在监听 {len(chat_ids)} 个群组的新消息...")
+            
+            disconnected = asyncio.ensure_future(self.client.disconnected)
+            stopped = asyncio.ensure_future(stop_event.wait()) if stop_event else None
+            try:
+                buffer = []
+                deadline = time.monotonic() + flush_interval
+                while not disconnected.done() and not (stopped and stopped.done()):
+                    try:
+                        buffer.append(await asyncio.wait_for(queue.get(), max(deadline - time.monotonic(), 0.01)))
+                    except asyncio.TimeoutError:
+                        pass
+                    if len(buffer) >= flush_size or time.monotonic() >= deadline:
+                        if buffer or media_rows:
+                            await flush(buffer)
+                            buffer = []
+                        deadline = time.monotonic() + flush_interval
+                        
+                # 写入剩余的消息并等待下载完成
+                while not queue.empty():
+                    buffer.append(queue.get_nowait())
+                await flush(buffer)
+                await self.download_pool.join()
+                await flush([])
+            finally:
+                self.client.remove_event_handler(on_message)
+                for future in (disconnected, stopped):
+                    if future and not future.done():
+                        future.cancel()
+            self._print_run_summary()
+        except Exception as e:
+            raise Exception(f"实时监听失败: {str(e)}")
+        finally:
+            await self._finish_run()
+
+    async def drain_media_queue(self, media_queue, batch_size=50, download_progress_callback=None,
+                                media_callback=None, stop_event=None):
+        """下载媒体队列中排队的媒体，直到队列为空或 stop_event 被设置
+
+        每次取出 batch_size 条，按群组批量重新获取消息（按ID获取，每个群组一次请求），
+        交给下载池下载，去重、断点续传与爬取时相同。下载完成后更新队列状态和消息存储中的
+        media_path/media_status，并以更新后的数据调用 media_callback(item)。消息已被删除时
+        直接标记为失败。上次中断时仍在下载的媒体会重新排队。
+        返回 {'done': 成功数, 'failed': 失败数}。
+        """
+        stats = {'done': 0, 'failed': 0}
+
+        def on_done(item, path):
+            if path:
+                media_queue.mark_done(item['group'], item['id'], path)
+                self.data_processor.update_media(item['group'], item['id'], path, 'done')
+                stats['done'] += 1
+            else:
+                media_queue.mark_failed(item['group'], item['id'], "下载失败")
+                stats['failed'] += 1
+            if media_callback:
+                media_callback({**item, 'media_path': path, 'status': 'done' if path else 'failed'})
+
+        self._start_run(download_progress_callback, None)
+        try:
+            await self.connect()
+            stale = media_queue.reset_stale()
+            if stale:
+                print(f"{stale} 个上次未完成的媒体已重新排队")
+            entities = {}
+            while not (stop_event and stop_event.is_set()):
+                items = media_queue.claim(batch_size)
+                if not items:
+                    break
+
+                by_group = {}
+                for item in items:
+                    by_group.setdefault(item['group'], []).append(item)
+                for group_id, group_items in by_group.items():
+                    try:
+                        if group_id not in entities:
+                            entities[group_id] = await self._get_group_entity(group_id)
+                        messages = await self.rate_limiter.call(
+                            'history', self.client.get_messages, entities[group_id],
+                            ids=[item['id'] for item in group_items]
+                        )
+                    except Exception as e:
+                        print(f"[{group_id}] 获取消息失败: {str(e)}")
+                        for item in group_items:
+                            media_queue.mark_failed(group_id, item['id'], str(e))
+                            stats['failed'] += 1
+                        continue
+
+                    for item, message in zip(group_items, messages):
+                        if message is None or not message.media:
+                            media_queue.mark_failed(group_id, item['id'], "消息已删除或不含媒体", permanent=True)
+                            self.data_processor.update_media(group_id, item['id'], None, 'failed')
+                            stats['failed'] += 1
+                            continue
+                        await self.download_pool.submit(
+                            message, item['media_type'], lambda path, item=item: on_done(item, path)
+                        )
+                # 本批下载完成后再取下一批，失败重新排队的媒体可在后续批次中重试
+                await self.download_pool.join()
+
+            print(f"媒体队列：下载完成 {stats['done']} 个，失败 {stats['failed']} 个")
+            self._print_run_summary()
+        except Exception as e:
+            raise Exception(f"下载媒体队列失败: {str(e)}")
+        finally:
+            await self._finish_run()
+        return stats
+
     def get_messages(self):
         """获取已爬取的消息"""
         return self.messages
         
     def export_to_pandas(self):
         """将数据转换为pandas DataFrame"""
-        return pd.DataFrame(self.messages) 
\ No newline at end of file
+        import pandas as pd
+        
+        return pd.DataFrame(self.messages)
\ No newline at end of file
@@ -1,73 +1,142 @@
 import json
 import os
 from datetime import datetime
-import pandas as pd
+from src.storage import SegmentLogStore, SQLiteMessageStore
 
 class DataProcessor:
-    def __init__(self, save_dir="data"):
+    def __init__(self, save_dir="data", backend="sqlite", segment_size=10000):
         self.save_dir = save_dir
         self.ensure_save_dir()
         
+        # 存储后端: "sqlite"、"jsonl" 或自定义的 MessageStore 实例
+        if backend == "sqlite":
+            self.store = SQLiteMessageStore(os.path.join(save_dir, "messages.db"))
+        elif backend == "jsonl":
+            self.store = SegmentLogStore(save_dir, segment_size=segment_size)
+        else:
+            self.store = backend
+        
     def ensure_save_dir(self):
         """确保保存目录存在"""
         if not os.path.exists(self.save_dir):
             os.makedirs(self.save_dir)
             
     def save_progress(self, group_id, messages, last_message_id=None, start_date=None):
-        """保存爬取进度和数据"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        progress_file = os.path.join(self.save_dir, f"progress_{group_id}.json")
-        data_file = os.path.join(self.save_dir, f"messages_{group_id}_{timestamp}.json")
-        
-        # 保存进度信息
-        progress_info = {
-            'group_id': group_id,
-            'last_message_id': last_message_id,
-            'start_date': start_date.isoformat() if start_date else None,
-            'message_count': len(messages),
-            'last_update': timestamp,
-            'data_file': data_file
-        }
-        
-        with open(progress_file, 'w', encoding='utf-8') as f:
-            json.dump(progress_info, f, ensure_ascii=False, indent=2)
-            
-        # 保存消息数据
-        with open(data_file, 'w', encoding='utf-8') as f:
-            json.dump(messages, f, ensure_ascii=False, indent=2)
+        """保存检查点
+
+        messages 只需包含上次检查点之后新增或更新的消息行，
+        由存储后端按 (group, id) 写入并更新进度。
+        """
+        self.store.checkpoint(group_id, messages, last_message_id=last_message_id, start_date=start_date)
             
-    def load_progress(self, group_id):
-        """加载上次的爬取进度"""
-        progress_file = os.path.join(self.save_dir, f"progress_{group_id}.json")
+    def load_progress_info(self, group_id):
+        """读取上次的爬取进度，不加载消息数据"""
+        try:
+            return self.store.load_progress(group_id) or self._load_legacy_progress_info(group_id)
+        except Exception as e:
+            print(f"加载进度失败: {str(e)}")
+        return None
         
-        if not os.path.exists(progress_file):
+    def load_progress(self, group_id):
+        """加载上次的爬取进度和全部消息"""
+        progress_info = self.load_progress_info(group_id)
+        if not progress_info:
             return None
             
         try:
-            with open(progress_file, 'r', encoding='utf-8') as f:
-                progress_info = json.load(f)
-                
-            # 加载消息数据
-            if os.path.exists(progress_info['data_file']):
-                with open(progress_info['data_file'], 'r', encoding='utf-8') as f:
-                    messages = json.load(f)
-                return progress_info, messages
-            
+            if 'data_file' in progress_info:
+                messages = self._load_legacy_messages(progress_info)
+            else:
+                messages = self.load_messages(group_id)
+            progress_info['message_count'] = len(messages)
+            return progress_info, messages
         except Exception as e:
             print(f"加载进度失败: {str(e)}")
         return None
         
-    def merge_messages(self, old_messages, new_messages):
-        """合并新旧消息数据"""
-        # 使用消息ID作为唯一标识
-        message_dict = {msg['id']: msg for msg in old_messages}
-        
-        # 添加新消息
-        for msg in new_messages:
-            if msg['id'] not in message_dict:
-                message_dict[msg['id']] = msg
-                
-        # 转换回列表并按时间排序
-        merged = list(message_dict.values())
-        merged.sort(key=lambda x: x['date'])
-        return merged 
\ No newline at end of file
+    def _load_legacy_progress_info(self, group_id):
+        """读取旧版整体快照格式的进度"""
+        progress_file = os.path.join(self.save_dir, f"progress_{group_id}.json")
+        if not os.path.exists(progress_file):
+            return None
+        with open(progress_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+            
+    def _load_legacy_messages(self, progress_info):
+        """加载旧版整体快照格式的消息数据"""
+        if not os.path.exists(progress_info['data_file']):
+            return []
+        with open(progress_info['data_file'], 'r', encoding='utf-8') as f:
+            messages = json.load(f)
+        for msg in messages:
+            if isinstance(msg.get('date'), str):
+                msg['date'] = datetime.fromisoformat(msg['date'])
+        return messages
+        
+    def save_shard_plan(self, group_id, ranges):
+        """保存群组按消息ID切分的范围，继续爬取时沿用，使各范围的进度键保持不变"""
+        plans = self._load_shard_plans()
+        plans[str(group_id)] = [list(item) for item in ranges]
+        with open(os.path.join(self.save_dir, "shard_plans.json"), 'w', encoding='utf-8') as f:
+            json.dump(plans, f, ensure_ascii=False, indent=2)
+            
+    def load_shard_plan(self, group_id):
+        """读取上次保存的切分范围 [(min_id, max_id), ...]，没有时返回 None"""
+        ranges = self._load_shard_plans().get(str(group_id))
+        return [tuple(item) for item in ranges] if ranges else None
+        
+    def _load_shard_plans(self):
+        plans_file = os.path.join(self.save_dir, "shard_plans.json")
+        if not os.path.exists(plans_file):
+            return {}
+        with open(plans_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+        
+    def load_messages(self, group_id):
+        """加载群组的全部消息，按时间排序；group_id 可以是群组列表"""
+        return list(self.store.iter_messages(group_id))
+        
+    def upsert_messages(self, messages):
+        """按 (group, id) 插入或更新消息，已存在的消息以新数据为准"""
+        self.store.upsert_messages(messages)
+        
+    def update_media(self, group_id, message_id, media_path, media_status):
+        """更新单条消息的媒体下载结果"""
+        self.store.update_media(group_id, message_id, media_path, media_status)
+        
+    def query_messages(self, group_id, **kwargs):
+        """分页查询消息，参数见 MessageStore.query_messages"""
+        return self.store.query_messages(group_id, **kwargs)
+        
+    def count_messages(self, group_id):
+        """已保存的消息数量；group_id 可以是群组列表"""
+        return self.store.count_messages(group_id)
+        
+    def get_max_message_id(self, group_id):
+        """已保存的最大消息ID"""
+        return self.store.get_max_message_id(group_id)
+        
+    def statistics(self, group_id, top=5):
+        """群组消息统计；group_id 可以是群组列表，此时合并统计"""
+        return self.store.statistics(group_id, top=top)
+        
+    def export_parquet(self, group_id, root_dir, batch_size=10000):
+        """将群组消息从存储导出为按群组和日期分区的 Parquet 文件，返回导出的行数"""
+        from src.parquet_writer import ParquetWriter
+        
+        writer = ParquetWriter(root_dir, row_group_size=batch_size)
+        batch = []
+        try:
+            for row in self.store.iter_messages(group_id):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    writer.write(batch)
+                    batch = []
+            writer.write(batch)
+        finally:
+            writer.close()
+        return writer.rows_written
+        
+    def close(self):
+        """关闭存储后端"""
+        self.store.close()
@@ -1,35 +1,151 @@
 import os
 import json
+import sqlite3
 import hashlib
+import time
 from datetime import datetime
 
 class DownloadManager:
-    def __init__(self, download_path="downloads"):
+    """媒体下载记录
+
+    记录保存在下载目录下的 SQLite 数据库中，按 file_id 索引，单条记录的增删为 O(1)。
+    写入先缓存在内存中，累计 commit_every 条或距上次提交超过 commit_interval 秒时
+    在一个短事务中批量提交，多个实例或进程可以共用同一个数据库；
+    崩溃时最多丢失最后一批未提交的记录，对应文件会在下次运行时重新下载。
+    首次运行时自动导入旧版 download_records.json。
+
+    文件按 Telegram 的照片/文档ID寻址，保存在 blobs/ 下，同一媒体只下载一次；
+    link_mode 为 "hardlink" 时每条消息另有一个指向该文件的硬链接，为 "reference" 时
+    直接引用同一文件。
+
+    大文件分块下载到 .part 文件，已写入磁盘的偏移量记录在 partial_downloads 表中，
+    重试或重启后从该偏移量继续。
+    """
+
+    def __init__(self, download_path="downloads", commit_every=100, commit_interval=5.0, link_mode="hardlink"):
         self.download_path = download_path
+        self.blob_path = os.path.join(download_path, "blobs")
+        self.link_mode = link_mode
+        self.dedup_hits = 0  # 复用已下载文件的次数
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
         self.record_file = os.path.join(download_path, "download_records.json")
-        self.download_records = self._load_records()
-        
-    def _load_records(self):
-        """加载下载记录"""
-        if os.path.exists(self.record_file):
-            try:
-                with open(self.record_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
-        
-    def _save_records(self):
-        """保存下载记录"""
-        os.makedirs(self.download_path, exist_ok=True)
-        with open(self.record_file, 'w', encoding='utf-8') as f:
-            json.dump(self.download_records, f, ensure_ascii=False, indent=2)
-            
-    def generate_file_id(self, message_id, media_type, file_size):
-        """生成文件唯一标识"""
-        content = f"{message_id}_{media_type}_{file_size}"
+        self.db_path = os.path.join(download_path, "download_records.db")
+        self._pending = {}  # (表名, file_id) -> 待写入的行，None 表示删除
+        self._last_commit = time.monotonic()
+
+        os.makedirs(download_path, exist_ok=True)
+        # 下载在爬虫线程中进行，与创建实例的线程可能不同
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS downloads (
+                file_id TEXT PRIMARY KEY,
+                file_path TEXT NOT NULL,
+                file_size INTEGER,
+                download_time TEXT
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS partial_downloads (
+                file_id TEXT PRIMARY KEY,
+                part_path TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                file_size INTEGER,
+                updated_at TEXT
+            )
+        """)
+        self.conn.commit()
+        self._migrate_json_records()
+
+    def _migrate_json_records(self):
+        """导入旧版 JSON 下载记录，导入后将原文件改名保留"""
+        if not os.path.exists(self.record_file):
+            return
+        try:
+            with open(self.record_file, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except Exception as e:
+            # 文件损坏时保留原文件以便手动恢复，而不是静默丢弃
+            print(f"下载记录文件已损坏，已改名为 .corrupt: {str(e)}")
+            os.replace(self.record_file, self.record_file + ".corrupt")
+            return
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO downloads (file_id, file_path, file_size, download_time) VALUES (?, ?, ?, ?)",
+                [
+                    (file_id, record['file_path'], record.get('file_size'), record.get('download_time'))
+                    for file_id, record in records.items()
+                ]
+            )
+        os.replace(self.record_file, self.record_file + ".migrated")
+        print(f"已导入 {len(records)} 条旧版下载记录")
+
+    def _write(self, table, file_id, row):
+        """缓存一次写入（row 为 None 表示删除），达到批量条件时提交"""
+        self._pending[(table, file_id)] = row
+        if len(self._pending) >= self.commit_every or time.monotonic() - self._last_commit >= self.commit_interval:
+            self.flush()
+
+    def _read(self, table, file_id, sql):
+        """读取一行，优先使用尚未提交的写入"""
+        if (table, file_id) in self._pending:
+            return self._pending[(table, file_id)]
+        row = self.conn.execute(sql, (file_id,)).fetchone()
+        return row[1:] if row else None
+
+    def flush(self):
+        """在一个事务中提交缓存的写入"""
+        if self._pending:
+            with self.conn:
+                for (table, file_id), row in self._pending.items():
+                    if row is None:
+                        self.conn.execute(f"DELETE FROM {table} WHERE file_id = ?", (file_id,))
+                    else:
+                        placeholders = ", ".join("?" * (len(row) + 1))
+                        self.conn.execute(f"INSERT OR REPLACE INTO {table} VALUES ({placeholders})", (file_id, *row))
+            self._pending = {}
+        self._last_commit = time.monotonic()
+
+    def generate_file_id(self, message_id, media_type, file_size, media_key=None):
+        """生成文件唯一标识
+
+        有 media_key（Telegram 的照片/文档ID）时按它生成，转发或重复发送的同一媒体得到
+        相同的标识；否则按消息ID、类型和大小生成。
+        """
+        content = media_key or f"{message_id}_{media_type}_{file_size}"
         return hashlib.md5(content.encode()).hexdigest()
-        
+
+    def get_blob_path(self, file_id, original_name):
+        """按文件标识获取 blobs/ 下的保存路径"""
+        filename = f"{file_id}_{original_name}" if original_name else file_id
+        safe_filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.'))
+        directory = os.path.join(self.blob_path, file_id[:2])
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, safe_filename)
+
+    def link_file(self, file_path, link_name, reused=False):
+        """为消息生成指向已下载文件的路径
+
+        hardlink 模式下在下载目录创建指向该文件的硬链接（已存在则直接复用），
+        不支持硬链接的文件系统上退回为直接引用原文件。reused 表示文件是之前下载的。
+        """
+        if reused:
+            self.dedup_hits += 1
+        if self.link_mode != "hardlink":
+            return file_path
+        safe_name = "".join(c for c in link_name if c.isalnum() or c in (' ', '-', '_', '.'))
+        link_path = os.path.join(self.download_path, safe_name)
+        if os.path.exists(link_path):
+            return link_path
+        try:
+            os.link(file_path, link_path)
+            return link_path
+        except OSError:
+            return file_path
+
     def get_file_path(self, file_id, original_name):
         """获取文件保存路径"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -37,46 +153,100 @@ class DownloadManager:
             filename = f"{timestamp}_{file_id}_{original_name}"
         else:
             filename = f"{timestamp}_{file_id}"
-        
+
         # 清理文件名
         safe_filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.'))
         return os.path.join(self.download_path, safe_filename)
-        
+
+    def get_record(self, file_id):
+        """获取下载记录，不存在时返回 None"""
+        row = self._read(
+            'downloads', file_id,
+            "SELECT file_id, file_path, file_size, download_time FROM downloads WHERE file_id = ?"
+        )
+        if row is None:
+            return None
+        return {'file_path': row[0], 'file_size': row[1], 'download_time': row[2]}
+
+    def count(self):
+        """下载记录数量"""
+        self.flush()
+        return self.conn.execute("SELECT COUNT(*) FROM downloads").fetchone()[0]
+
+    def adopt_record(self, old_file_id, file_id):
+        """把旧标识下的下载记录改到新标识下，新标识已有记录或旧记录不存在时不做改动，返回是否改动"""
+        if old_file_id == file_id or self.get_record(file_id) is not None:
+            return False
+        record = self.get_record(old_file_id)
+        if record is None:
+            return False
+        self._write('downloads', file_id, (record['file_path'], record['file_size'], record['download_time']))
+        self._write('downloads', old_file_id, None)
+        return True
+
     def is_file_completed(self, file_id, file_size):
         """检查文件是否已完整下载"""
-        if file_id not in self.download_records:
+        record = self.get_record(file_id)
+        if record is None:
             return False
-            
-        record = self.download_records[file_id]
+
         file_path = record['file_path']
-        
+
         if not os.path.exists(file_path):
-            del self.download_records[file_id]
-            self._save_records()
+            self._write('downloads', file_id, None)
             return False
-            
+
         if os.path.getsize(file_path) != file_size:
             return False
-            
+
         return True
-        
+
     def add_download_record(self, file_id, file_path, file_size):
         """添加下载记录"""
-        self.download_records[file_id] = {
-            'file_path': file_path,
-            'file_size': file_size,
-            'download_time': datetime.now().isoformat()
-        }
-        self._save_records()
-        
+        self._write('downloads', file_id, (file_path, file_size, datetime.now().isoformat()))
+
     def remove_download_record(self, file_id):
         """删除下载记录"""
-        if file_id in self.download_records:
-            file_path = self.download_records[file_id]['file_path']
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except:
-                    pass
-            del self.download_records[file_id]
-            self._save_records() 
\ No newline at end of file
+        record = self.get_record(file_id)
+        if record is None:
+            return
+        if os.path.exists(record['file_path']):
+            try:
+                os.remove(record['file_path'])
+            except:
+                pass
+        self._write('downloads', file_id, None)
+
+    def get_partial(self, file_id):
+        """获取未完成下载的 .part 文件路径和已确认写入的偏移量，不存在时返回 None"""
+        row = self._read(
+            'partial_downloads', file_id,
+            "SELECT file_id, part_path, offset, file_size, updated_at FROM partial_downloads WHERE file_id = ?"
+        )
+        if row is None:
+            return None
+        return {'part_path': row[0], 'offset': row[1], 'file_size': row[2]}
+
+    def save_partial(self, file_id, part_path, offset, file_size):
+        """记录未完成下载的偏移量，调用前数据需已写入磁盘
+
+        批量提交时记录的偏移量只会落后于实际写入的数据，继续下载时按记录截断后重新获取即可。
+        """
+        self._write('partial_downloads', file_id, (part_path, offset, file_size, datetime.now().isoformat()))
+
+    def remove_partial(self, file_id, delete_file=False):
+        """删除未完成下载的记录，delete_file 为 True 时同时删除 .part 文件"""
+        partial = self.get_partial(file_id)
+        if partial is None:
+            return
+        if delete_file and os.path.exists(partial['part_path']):
+            try:
+                os.remove(partial['part_path'])
+            except OSError:
+                pass
+        self._write('partial_downloads', file_id, None)
+
+    def close(self):
+        """提交剩余记录并关闭数据库"""
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,87 @@
+import asyncio
+
+
+class MediaDownloadPool:
+    """媒体下载工作池
+
+    下载任务在后台并发执行，不阻塞消息处理。并发数受全局上限和按媒体类型的上限
+    共同约束，例如同时最多下载 4 个文件，其中视频最多 2 个。
+    """
+
+    def __init__(self, download_func, max_concurrent=4, type_limits=None, max_pending=500):
+        self.download_func = download_func  # 协程函数: download_func(message) -> 文件路径或 None
+        self.max_concurrent = max_concurrent
+        self.type_limits = type_limits or {}
+        self.max_pending = max_pending  # 排队中的下载任务上限，防止消息对象在内存中堆积
+        self._global_semaphore = None
+        self._type_semaphores = {}
+        self._pending_semaphore = None
+        self._tasks = set()
+        self.completed = 0
+        self.failed = 0
+
+    def _ensure_started(self):
+        """在事件循环中初始化信号量"""
+        if self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._pending_semaphore = asyncio.Semaphore(self.max_pending)
+            self._type_semaphores = {
+                media_type: asyncio.Semaphore(limit)
+                for media_type, limit in self.type_limits.items()
+            }
+
+    @property
+    def active_count(self):
+        """尚未完成的下载任务数"""
+        return len(self._tasks)
+
+    async def submit(self, message, media_type, on_done=None):
+        """提交下载任务，完成后以 on_done(path) 回调，失败时 path 为 None"""
+        self._ensure_started()
+        # 排队任务过多时等待，形成背压
+        await self._pending_semaphore.acquire()
+        task = asyncio.create_task(self._run(message, media_type, on_done))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, message, media_type, on_done):
+        """执行单个下载任务"""
+        path = None
+        try:
+            type_semaphore = self._type_semaphores.get(media_type)
+            if type_semaphore:
+                async with type_semaphore:
+                    async with self._global_semaphore:
+                        path = await self.download_func(message)
+            else:
+                async with self._global_semaphore:
+                    path = await self.download_func(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"下载任务 {message.id} 失败: {str(e)}")
+        finally:
+            self._pending_semaphore.release()
+
+        if path:
+            self.completed += 1
+        else:
+            self.failed += 1
+        if on_done:
+            try:
+                on_done(path)
+            except Exception as e:
+                print(f"下载完成回调出错: {str(e)}")
+
+    async def join(self):
+        """等待所有已提交的下载任务完成"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def cancel(self):
+        """取消所有未完成的下载任务"""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
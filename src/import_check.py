@@ -0,0 +1,98 @@
+"""导入耗时检查
+
+在独立的 Python 进程中用 -X importtime 导入各入口模块，检查总耗时是否超出预算，
+以及是否在启动时加载了只应按需加载的重量级依赖（pandas、pyarrow、PyQt6 等）。
+
+用法:
+    python -m src.import_check
+    python -m src.import_check --scale 2  # 在较慢的机器上放宽预算
+    python -m src.import_check --allow-missing telethon  # 未安装 telethon 的环境中跳过依赖它的模块
+
+导入失败计为检查失败；只有 --allow-missing 列出的依赖未安装时才跳过该模块。
+"""
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+
+# 模块 -> (耗时预算毫秒, 启动时不应加载的模块)
+BUDGETS = {
+    'src.cli': (150, ['PyQt6', 'pandas', 'pyarrow', 'telethon']),
+    'src.crawler': (800, ['PyQt6', 'pandas', 'pyarrow']),
+    'src.data_processor': (150, ['PyQt6', 'pandas', 'pyarrow']),
+    'src.session_pool': (800, ['PyQt6', 'pandas', 'pyarrow']),
+    # 图形界面启动路径：PyQt6 本身必须加载，爬虫（telethon）在开始采集时才加载
+    'src.main_window': (400, ['telethon', 'pandas', 'pyarrow']),
+}
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+MISSING_MODULE = re.compile(r"ModuleNotFoundError: No module named '([^']+)'")
+
+
+class ImportFailed(Exception):
+    """模块导入失败，missing 为未安装的顶层包名（其他原因失败时为 None）"""
+
+    def __init__(self, message, missing=None):
+        super().__init__(message)
+        self.missing = missing
+
+
+def measure(module):
+    """导入模块，返回 (总耗时毫秒, 已加载的顶层包集合)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=project_root,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"退出码 {result.returncode}"
+        match = MISSING_MODULE.search(error)
+        raise ImportFailed(f"导入 {module} 失败: {error}", match.group(1).split('.')[0] if match else None)
+
+    total_us = 0
+    packages = set()
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        total_us += int(match.group(1))
+        packages.add(match.group(4).split('.')[0])
+    return total_us / 1000, packages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="检查入口模块的导入耗时")
+    parser.add_argument('modules', nargs='*', help="要检查的模块，默认检查全部入口")
+    parser.add_argument('--scale', type=float, default=1.0, help="预算倍数")
+    parser.add_argument('--allow-missing', action='append', default=[], metavar='PACKAGE',
+                        help="允许未安装的可选依赖，缺少它而无法导入的模块跳过检查，可重复指定")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules or BUDGETS:
+        budget, forbidden = BUDGETS.get(module, (None, []))
+        try:
+            elapsed, packages = measure(module)
+        except ImportFailed as e:
+            if e.missing and e.missing in args.allow_missing:
+                print(f"[跳过] {module}: 未安装 {e.missing}")
+            else:
+                print(f"[失败] {e}")
+                failed = True
+            continue
+
+        problems = [f"启动时加载了 {name}" for name in forbidden if name in packages]
+        if budget is not None and elapsed > budget * args.scale:
+            problems.append(f"耗时超出预算 {budget * args.scale:.0f} ms")
+        status = "失败" if problems else "通过"
+        print(f"[{status}] {module}: {elapsed:.1f} ms" + (f" ({'; '.join(problems)})" if problems else ""))
+        failed = failed or bool(problems)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
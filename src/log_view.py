@@ -0,0 +1,182 @@
+import threading
+import time
+from collections import deque
+
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QComboBox, QPushButton, QLabel
+from PyQt6.QtCore import QTimer
+
+LEVELS = ['debug', 'info', 'warning', 'error']
+LEVEL_NAMES = {'debug': '调试', 'info': '信息', 'warning': '警告', 'error': '错误'}
+
+_context = threading.local()
+
+
+def set_stage(stage):
+    """设置当前线程输出日志所属的阶段（如 采集、下载、导出），print 的输出按此归类"""
+    _context.stage = stage
+
+
+def classify(text):
+    """按关键字推断 print 输出的级别"""
+    if any(word in text for word in ('失败', '出错', '错误', '异常')):
+        return 'error'
+    if any(word in text for word in ('重试', '等待', 'FloodWait', '跳过', '已损坏')):
+        return 'warning'
+    return 'info'
+
+
+class LogBuffer:
+    """固定容量的日志环形缓冲区
+
+    追加为 O(1)，超出容量时丢弃最旧的记录；每条记录有递增的序号，
+    显示端按序号增量读取新记录。可在多个线程中同时写入。
+    """
+
+    def __init__(self, capacity=5000):
+        self.capacity = capacity
+        self._records = deque(maxlen=capacity)  # (序号, 时间, 级别, 阶段, 文本)
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def append(self, text, level='info', stage=None):
+        with self._lock:
+            self._seq += 1
+            self._records.append((self._seq, time.time(), level, stage or '界面', text))
+
+    @property
+    def last_seq(self):
+        return self._seq
+
+    def since(self, seq):
+        """序号大于 seq 的记录，按时间顺序返回"""
+        with self._lock:
+            records = []
+            for record in reversed(self._records):
+                if record[0] <= seq:
+                    break
+                records.append(record)
+        records.reverse()
+        return records
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+
+class LogStream:
+    """替代 sys.stdout 的文件对象：把 print 的输出逐行写入 LogBuffer，同时写到原来的输出"""
+
+    def __init__(self, buffer, original=None):
+        self.buffer = buffer
+        self.original = original
+        self._partial = threading.local()  # 各线程未写完的一行
+
+    def write(self, text):
+        if self.original is not None:
+            self.original.write(text)
+        pending = getattr(self._partial, 'text', '') + text
+        *lines, self._partial.text = pending.split('\n')
+        stage = getattr(_context, 'stage', None)
+        for line in lines:
+            if line.strip():
+                self.buffer.append(line, classify(line), stage)
+        return len(text)
+
+    def flush(self):
+        if self.original is not None:
+            self.original.flush()
+
+    def isatty(self):
+        return False
+
+
+class LogView(QWidget):
+    """日志显示区域
+
+    数据保存在 LogBuffer 中，显示端用定时器每 refresh_interval 毫秒把新记录一次性追加到
+    QPlainTextEdit（最多保留 capacity 行），每秒数千行也不会阻塞界面。可按级别和阶段过滤，
+    切换过滤条件时从缓冲区重建显示内容。
+    """
+
+    def __init__(self, buffer=None, capacity=5000, refresh_interval=100, parent=None):
+        super().__init__(parent)
+        self.buffer = buffer or LogBuffer(capacity)
+        self._shown_seq = 0
+        self._stages = []
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("级别:"))
+        self.level_combo = QComboBox()
+        for level in LEVELS[1:]:
+            self.level_combo.addItem(f"{LEVEL_NAMES[level]}及以上" if level != 'error' else "仅错误", level)
+        self.level_combo.currentIndexChanged.connect(self.rebuild)
+        filter_layout.addWidget(self.level_combo)
+        filter_layout.addWidget(QLabel("阶段:"))
+        self.stage_combo = QComboBox()
+        self.stage_combo.addItem("全部", None)
+        self.stage_combo.currentIndexChanged.connect(self.rebuild)
+        filter_layout.addWidget(self.stage_combo)
+        filter_layout.addStretch()
+        self.clear_button = QPushButton("清空")
+        self.clear_button.clicked.connect(self.clear)
+        filter_layout.addWidget(self.clear_button)
+        layout.addLayout(filter_layout)
+
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setMaximumBlockCount(self.buffer.capacity)
+        layout.addWidget(self.text)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(refresh_interval)
+
+    def log(self, text, level='info', stage=None):
+        """追加一条日志，多行文本逐行记录"""
+        for line in str(text).split('\n'):
+            self.buffer.append(line, level, stage)
+
+    def _accepts(self, record):
+        if LEVELS.index(record[2]) < LEVELS.index(self.level_combo.currentData()):
+            return False
+        stage = self.stage_combo.currentData()
+        return stage is None or record[3] == stage
+
+    def _format(self, record):
+        prefix = time.strftime('%H:%M:%S', time.localtime(record[1]))
+        level = f"[{LEVEL_NAMES[record[2]]}] " if record[2] != 'info' else ""
+        return f"{prefix} {level}[{record[3]}] {record[4]}"
+
+    def _add_stages(self, records):
+        for record in records:
+            if record[3] not in self._stages:
+                self._stages.append(record[3])
+                self.stage_combo.addItem(record[3], record[3])
+
+    def refresh(self):
+        """把上次刷新以来的新记录一次性追加到显示区域"""
+        if self.buffer.last_seq == self._shown_seq:
+            return
+        records = self.buffer.since(self._shown_seq)
+        if not records:
+            return
+        self._shown_seq = records[-1][0]
+        self._add_stages(records)
+        lines = [self._format(record) for record in records[-self.buffer.capacity:] if self._accepts(record)]
+        if lines:
+            self.text.appendPlainText('\n'.join(lines))
+
+    def rebuild(self):
+        """按当前过滤条件重建显示内容"""
+        records = self.buffer.records()
+        self._shown_seq = records[-1][0] if records else self._shown_seq
+        self.text.setPlainText('\n'.join(self._format(record) for record in records if self._accepts(record)))
+        self.text.verticalScrollBar().setValue(self.text.verticalScrollBar().maximum())
+
+    def clear(self):
+        """清空显示（缓冲区中的记录保留，切换过滤条件时重新显示）"""
+        self._shown_seq = self.buffer.last_seq
+        self.text.clear()
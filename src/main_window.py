@@ -1,69 +1,112 @@
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                            QLabel, QLineEdit, QPushButton, QProgressBar,
                            QDateTimeEdit, QGroupBox, QTextEdit, QFileDialog, QDialog,
-                           QSplitter, QListWidget, QListWidgetItem)
-from PyQt6.QtCore import Qt, QDateTime, QThread, pyqtSignal
+                           QSplitter, QTableView, QHeaderView, QAbstractItemView, QComboBox, QCheckBox)
+from PyQt6.QtCore import Qt, QDateTime, QThread, QTimer, pyqtSignal
 from PyQt6.QtGui import QPixmap
 import sys
-import pandas as pd
+import re
+import time
 from datetime import datetime
 import asyncio
-from src.crawler import TelegramCrawler
 from src.config_manager import ConfigManager
-from src.proxy_dialog import ProxyDialog
-from src.auth_dialog import PhoneInputDialog, CodeInputDialog
-from src.message_detail_dialog import MessageDetailDialog
+from src.data_processor import DataProcessor
+from src.progress import ProgressAggregator
+from src.stats_aggregator import StatsAggregator
+from src.log_view import LogView, LogStream, set_stage
+from src.message_model import MessageTableModel
 
 class CrawlerThread(QThread):
-    progress_updated = pyqtSignal(float, str)
-    media_progress_updated = pyqtSignal(int, float, float, str, str, int, int)  # message_id, percentage, speed, media_type, filename, received, total
+    # 进度不通过信号逐条发送，而是写入 self.progress，由界面定时读取快照
     finished = pyqtSignal(object)
     error = pyqtSignal(str)
     
-    def __init__(self, api_id, api_hash, group_id, start_date, proxy_config=None, limit=None, resume=False):
+    def __init__(self, api_id, api_hash, group_ids, start_date, proxy_config=None, limit=None, resume=False,
+                 from_date=None, reverse=False, sync=False, media_metadata=False, media_policy=None):
         super().__init__()
         self.api_id = api_id
         self.api_hash = api_hash
-        self.group_id = group_id
+        self.group_ids = group_ids
         self.start_date = start_date
+        self.from_date = from_date
+        self.reverse = reverse
         self.proxy_config = proxy_config
         self.limit = limit
         self.resume = resume
+        self.sync = sync  # 增量同步：只获取已保存的最大消息ID之后的新消息
+        self.progress = ProgressAggregator()
+        self.stats = StatsAggregator()  # 本次运行处理过的消息的实时统计
+        
+        # 创建爬虫实例；telethon 只在开始采集时加载，不拖慢界面启动
+        from src.crawler import TelegramCrawler
+        from src.media_queue import MediaQueue
         
-        # 创建爬虫实例
         try:
             api_id = int(self.api_id)
             self.crawler = TelegramCrawler(api_id, self.api_hash, proxy=self.proxy_config)
+            self.crawler.media_policy = media_policy
+            self.crawler.stats = self.stats
+            if media_metadata:
+                # 只记录媒体信息，媒体登记到下载队列，之后在“媒体队列”中选择下载
+                self.crawler.media_mode = 'metadata'
+                self.crawler.media_queue = MediaQueue()
         except ValueError:
             self.error.emit("API ID 必须是数字")
         except Exception as e:
             self.error.emit(f"初始化错误: {str(e)}")
         
     def run(self):
+        set_stage('同步' if self.sync else '采集')
         try:
             # 创建新的事件循环
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             
             try:
-                # 定义媒体下载进度回调
-                def media_progress_callback(message_id, percentage, speed, media_type, filename, received, total):
-                    self.media_progress_updated.emit(message_id, percentage, speed, media_type, filename, received, total)
-                
                 # 运行爬虫
-                loop.run_until_complete(
-                    self.crawler.start_crawling(
-                        self.group_id,
-                        self.start_date,
-                        lambda p, m: self.progress_updated.emit(p, m),
-                        media_progress_callback,  # 传递媒体下载进度回调
-                        limit=self.limit,
-                        resume=self.resume
+                if self.sync:
+                    loop.run_until_complete(
+                        self.crawler.sync_groups(
+                            self.group_ids,
+                            self.progress.update,
+                            self.progress.update_media,
+                            group_progress_callback=self.progress.update_group,
+                            keep_messages=False
+                        )
+                    )
+                elif len(self.group_ids) == 1:
+                    loop.run_until_complete(
+                        self.crawler.start_crawling(
+                            self.group_ids[0],
+                            self.start_date,
+                            self.progress.update,
+                            self.progress.update_media,
+                            limit=self.limit,
+                            resume=self.resume,
+                            from_date=self.from_date,
+                            reverse=self.reverse,
+                            keep_messages=False
+                        )
+                    )
+                else:
+                    # 多个群组共用一个客户端并发爬取，进度条显示已完成的群组比例
+                    loop.run_until_complete(
+                        self.crawler.crawl_groups(
+                            self.group_ids,
+                            self.start_date,
+                            self.progress.update,
+                            self.progress.update_media,
+                            group_progress_callback=self.progress.update_group,
+                            limit=self.limit,
+                            resume=self.resume,
+                            from_date=self.from_date,
+                            reverse=self.reverse,
+                            keep_messages=False
+                        )
                     )
-                )
                 
-                # 获取结果
-                self.finished.emit(self.crawler.get_messages())
+                # 消息已写入存储，预览、统计和导出都从存储读取，这里只返回本次运行的统计
+                self.finished.emit(self.stats.snapshot())
                 
             except Exception as e:
                 self.error.emit(f"爬取过程出错: {str(e)}")
@@ -86,6 +129,38 @@ class CrawlerThread(QThread):
         except Exception as e:
             self.error.emit(f"运行错误: {str(e)}")
 
+class MediaDownloadThread(CrawlerThread):
+    """下载媒体队列中排队的媒体，完成时 finished 发出 {'done': 成功数, 'failed': 失败数}"""
+    
+    def __init__(self, api_id, api_hash, proxy_config=None, media_policy=None):
+        super().__init__(api_id, api_hash, [], None, proxy_config=proxy_config, media_policy=media_policy)
+        
+    def run(self):
+        from src.media_queue import MediaQueue
+        
+        set_stage('下载')
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        media_queue = MediaQueue()
+        try:
+            def media_callback(item):
+                status = "完成" if item['status'] == 'done' else "失败"
+                print(f"[{item['group']}] 消息 {item['id']} 的媒体下载{status}")
+                
+            stats = loop.run_until_complete(
+                self.crawler.drain_media_queue(
+                    media_queue,
+                    download_progress_callback=self.progress.update_media,
+                    media_callback=media_callback
+                )
+            )
+            self.finished.emit(stats)
+        except Exception as e:
+            self.error.emit(f"下载媒体出错: {str(e)}")
+        finally:
+            media_queue.close()
+            loop.close()
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -95,6 +170,21 @@ class MainWindow(QMainWindow):
         # 初始化配置管理器
         self.config_manager = ConfigManager()
         
+        # 进度按固定帧率刷新，与消息处理速率无关
+        self.progress_fps = 10
+        self.progress_source = None  # 当前工作线程的 ProgressAggregator
+        self.rendered_version = -1
+        # 实时统计每 stats_interval 秒重绘一次
+        self.stats_interval = 1.0
+        self.stats_source = None  # 当前爬取的 StatsAggregator
+        self.stats_rendered_at = 0.0
+        self.progress_timer = QTimer(self)
+        self.progress_timer.timeout.connect(self.render_progress)
+        
+        # 已保存的消息数据，统计和导出都从这里查询
+        self.data_processor = DataProcessor()
+        self.current_group_ids = []
+        
         # 创建一个中央部件
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -134,7 +224,7 @@ class MainWindow(QMainWindow):
         # 群组ID配置
         group_layout = QHBoxLayout()
         self.group_id_input = QLineEdit()
-        self.group_id_input.setPlaceholderText("输入群组ID (例如: -1001234567890)")
+        self.group_id_input.setPlaceholderText("输入群组ID (例如: -1001234567890)，多个群组用逗号分隔")
         group_layout.addWidget(QLabel("群组ID:"))
         group_layout.addWidget(self.group_id_input)
         config_layout.addLayout(group_layout)
@@ -150,6 +240,9 @@ class MainWindow(QMainWindow):
         self.limit_input.setPlaceholderText("不填则爬取全部消息")
         limit_layout.addWidget(QLabel("爬取数量:"))
         limit_layout.addWidget(self.limit_input)
+        self.metadata_checkbox = QCheckBox("仅记录媒体信息")
+        self.metadata_checkbox.setToolTip("不下载媒体文件，之后在“媒体队列”中选择要下载的媒体")
+        limit_layout.addWidget(self.metadata_checkbox)
         config_layout.addLayout(limit_layout)
         
         # 时间选择
@@ -161,6 +254,20 @@ class MainWindow(QMainWindow):
         time_layout.addWidget(QLabel("(将爬取此时间之前的消息)"))
         config_layout.addLayout(time_layout)
         
+        # 最早时间（可选），与起始时间组成爬取的时间窗口
+        from_time_layout = QHBoxLayout()
+        self.from_time_enabled = QCheckBox("最早时间:")
+        self.from_time = QDateTimeEdit(QDateTime.currentDateTime().addMonths(-1))
+        self.from_time.setCalendarPopup(True)
+        self.from_time.setEnabled(False)
+        self.from_time_enabled.toggled.connect(self.from_time.setEnabled)
+        self.reverse_checkbox = QCheckBox("从旧到新")
+        from_time_layout.addWidget(self.from_time_enabled)
+        from_time_layout.addWidget(self.from_time)
+        from_time_layout.addWidget(self.reverse_checkbox)
+        from_time_layout.addWidget(QLabel("(不勾选则爬取起始时间之前的全部消息)"))
+        config_layout.addLayout(from_time_layout)
+        
         config_group.setLayout(config_layout)
         self.main_layout.addWidget(config_group)
 
@@ -180,11 +287,17 @@ class MainWindow(QMainWindow):
         progress_layout.addWidget(media_progress_label)
         progress_layout.addWidget(self.media_progress_bar)
         
-        # 状态信息
-        self.status_text = QTextEdit()
-        self.status_text.setReadOnly(True)
-        self.status_text.setMaximumHeight(150)
-        progress_layout.addWidget(self.status_text)
+        # 当前状态（按帧刷新的进度快照）
+        self.status_label = QLabel()
+        self.status_label.setWordWrap(True)
+        progress_layout.addWidget(self.status_label)
+        
+        # 日志，爬虫线程中 print 的输出也显示在这里
+        self.log_view = LogView()
+        self.log_view.setMinimumHeight(150)
+        progress_layout.addWidget(self.log_view)
+        self.original_stdout = sys.stdout
+        sys.stdout = LogStream(self.log_view.buffer, self.original_stdout)
         
         progress_group.setLayout(progress_layout)
         self.main_layout.addWidget(progress_group)
@@ -204,14 +317,46 @@ class MainWindow(QMainWindow):
         stats_layout.addWidget(self.stats_text)
         splitter.addWidget(stats_widget)
         
-        # 右侧消息预览
+        # 右侧消息预览，滚动时按需从存储加载，可浏览全部已保存的消息
         preview_widget = QWidget()
         preview_layout = QVBoxLayout(preview_widget)
-        preview_label = QLabel("消息预览")
-        self.message_list = QListWidget()
-        self.message_list.itemClicked.connect(self.show_message_detail)
+        preview_label = QLabel("消息预览（双击查看详情）")
         preview_layout.addWidget(preview_label)
-        preview_layout.addWidget(self.message_list)
+        
+        filter_layout = QHBoxLayout()
+        self.sender_filter = QLineEdit()
+        self.sender_filter.setPlaceholderText("发送者")
+        self.sender_filter.returnPressed.connect(self.apply_message_filters)
+        filter_layout.addWidget(self.sender_filter)
+        self.media_filter = QComboBox()
+        self.media_filter.addItem("全部媒体", None)
+        for media_type, name in (('photo', '图片'), ('video', '视频'), ('document', '文档'), ('audio', '音频')):
+            self.media_filter.addItem(name, media_type)
+        filter_layout.addWidget(self.media_filter)
+        self.date_filter_enabled = QCheckBox("时间:")
+        filter_layout.addWidget(self.date_filter_enabled)
+        self.date_filter_from = QDateTimeEdit(QDateTime.currentDateTime().addDays(-7))
+        self.date_filter_to = QDateTimeEdit(QDateTime.currentDateTime())
+        filter_layout.addWidget(self.date_filter_from)
+        filter_layout.addWidget(self.date_filter_to)
+        filter_button = QPushButton("筛选")
+        filter_button.clicked.connect(self.apply_message_filters)
+        filter_layout.addWidget(filter_button)
+        preview_layout.addLayout(filter_layout)
+        
+        self.message_model = MessageTableModel(self.data_processor)
+        self.message_view = QTableView()
+        self.message_view.setModel(self.message_model)
+        self.message_view.setSortingEnabled(True)
+        self.message_view.sortByColumn(0, Qt.SortOrder.DescendingOrder)
+        self.message_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.message_view.setWordWrap(False)
+        # 固定行高，视图不需要逐行测量内容
+        self.message_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.message_view.verticalHeader().setDefaultSectionSize(22)
+        self.message_view.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        self.message_view.doubleClicked.connect(self.show_message_detail)
+        preview_layout.addWidget(self.message_view)
         splitter.addWidget(preview_widget)
         
         analysis_layout.addWidget(splitter)
@@ -236,20 +381,44 @@ class MainWindow(QMainWindow):
         self.resume_button.clicked.connect(lambda: self.start_crawling(resume=True))
         action_layout.addWidget(self.resume_button)
         
+        # 增量同步按钮
+        self.sync_button = QPushButton("增量同步")
+        self.sync_button.setToolTip("只获取上次保存之后的新消息")
+        self.sync_button.clicked.connect(lambda: self.start_crawling(sync=True))
+        action_layout.addWidget(self.sync_button)
+        
+        # 媒体队列按钮
+        self.media_queue_button = QPushButton("媒体队列")
+        self.media_queue_button.setToolTip("选择仅记录了信息的媒体进行下载")
+        self.media_queue_button.clicked.connect(self.show_media_queue)
+        action_layout.addWidget(self.media_queue_button)
+        
         # 导出按钮
         self.export_button = QPushButton("导出Excel")
         self.export_button.clicked.connect(self.export_data)
         self.export_button.setEnabled(False)
         action_layout.addWidget(self.export_button)
         
+        # 导出Parquet按钮
+        self.export_parquet_button = QPushButton("导出Parquet")
+        self.export_parquet_button.clicked.connect(self.export_parquet)
+        self.export_parquet_button.setEnabled(False)
+        action_layout.addWidget(self.export_parquet_button)
+        
         self.main_layout.addLayout(action_layout)
 
-    def start_crawling(self, resume=False):
+    def start_crawling(self, resume=False, sync=False):
         # 获取输入值
         api_id = self.api_id_input.text().strip()
         api_hash = self.api_hash_input.text().strip()
         group_id = self.group_id_input.text().strip()
         start_date = self.start_time.dateTime().toPyDateTime()
+        from_date = None
+        if self.from_time_enabled.isChecked():
+            from_date = self.from_time.dateTime().toPyDateTime()
+            if from_date > start_date:
+                self.log_view.log("最早时间不能晚于起始时间", 'error')
+                return
         
         # 获取消息数量限制
         limit_text = self.limit_input.text().strip()
@@ -258,90 +427,108 @@ class MainWindow(QMainWindow):
             try:
                 limit = int(limit_text)
                 if limit <= 0:
-                    self.status_text.setText("爬取数量必须大于0")
+                    self.log_view.log("爬取数量必须大于0", 'error')
                     return
             except ValueError:
-                self.status_text.setText("爬取数量必须是数字")
+                self.log_view.log("爬取数量必须是数字", 'error')
                 return
         
         # 验证输入
         if not all([api_id, api_hash, group_id]):
-            self.status_text.setText("请填写所有必要信息")
+            self.log_view.log("请填写所有必要信息", 'error')
             return
             
         try:
             # 验证API ID是否为数字
             int(api_id)
         except ValueError:
-            self.status_text.setText("API ID必须是数字")
+            self.log_view.log("API ID必须是数字", 'error')
+            return
+            
+        media_policy = self.load_media_policy()
+        if media_policy is False:
             return
             
         # 创建并启动爬虫线程
+        self.current_group_ids = [g for g in re.split(r'[,，\s]+', group_id) if g]
         self.crawler_thread = CrawlerThread(
-            api_id, api_hash, group_id, start_date, 
+            api_id, api_hash, self.current_group_ids, start_date, 
             proxy_config=getattr(self, 'proxy_config', None),
             limit=limit,
-            resume=resume
+            resume=resume,
+            from_date=from_date,
+            reverse=self.reverse_checkbox.isChecked(),
+            sync=sync,
+            media_metadata=self.metadata_checkbox.isChecked(),
+            media_policy=media_policy
         )
         
         # 连接所有信号
-        self.crawler_thread.progress_updated.connect(self.update_progress)
-        self.crawler_thread.media_progress_updated.connect(self.update_media_progress)
+        self.watch_progress(self.crawler_thread.progress, self.crawler_thread.stats)
         self.crawler_thread.finished.connect(self.crawling_finished)
         self.crawler_thread.error.connect(self.crawling_error)
         
         # 禁用按钮
         self.start_button.setEnabled(False)
+        self.sync_button.setEnabled(False)
+        self.media_queue_button.setEnabled(False)
         self.export_button.setEnabled(False)
+        self.export_parquet_button.setEnabled(False)
         
         # 启动线程
         self.crawler_thread.start()
         
-    def update_progress(self, progress, message):
-        self.progress_bar.setValue(int(progress))
-        current_text = self.status_text.toPlainText()
-        lines = current_text.split('\n')
-        # 保持最多显示10行
-        if len(lines) > 10:
-            lines = lines[1:]
-        lines.append(message)
-        self.status_text.setText('\n'.join(lines))
-        # 滚动到底部
-        self.status_text.verticalScrollBar().setValue(
-            self.status_text.verticalScrollBar().maximum()
-        )
-
-    def update_media_progress(self, message_id, percentage, speed, media_type, filename, received, total):
-        """更新媒体下载进度"""
-        self.media_progress_bar.setValue(int(percentage))
-        
-        # 格式化显示信息
+    def watch_progress(self, progress, stats=None):
+        """开始按固定帧率显示工作线程的进度，指定 stats 时同时显示实时统计"""
+        self.progress_source = progress
+        self.rendered_version = -1
+        self.stats_source = stats
+        self.stats_rendered_at = 0.0
+        self.progress_timer.start(int(1000 / self.progress_fps))
+        
+    def stop_progress(self):
+        """显示最后一帧并停止刷新"""
+        self.render_progress()
+        self.progress_timer.stop()
+        self.progress_source = None
+        
+    def render_progress(self):
+        """把进度快照一次性绘制到进度条和状态区域，没有变化时跳过"""
+        if self.progress_source is None or self.progress_source.version == self.rendered_version:
+            return
+        now = time.monotonic()
+        if self.stats_source is not None and now - self.stats_rendered_at >= self.stats_interval:
+            self.stats_rendered_at = now
+            self.stats_text.setText("爬取中（本次运行，发言人数为估计值）\n" + self.format_statistics(self.stats_source.snapshot()))
+        snapshot = self.progress_source.snapshot()
+        self.rendered_version = snapshot['version']
+        self.progress_bar.setValue(int(snapshot['progress']))
+        
+        lines = snapshot['lines'][-1:]
+        for group_id, (progress, message) in snapshot['groups'].items():
+            lines.append(f"[{group_id}] {progress:.0f}% {message.splitlines()[0] if message else ''}")
+            
         media_type_names = {
             'photo': '图片',
             'video': '视频',
             'audio': '音频',
             'document': '文档'
         }
-        
-        media_type_display = media_type_names.get(media_type, media_type)
-        status = (
-            f"正在下载{media_type_display}文件:\n"
-            f"文件名: {filename}\n"
-            f"进度: {percentage:.1f}% ({self.format_size(received)}/{self.format_size(total)})\n"
-            f"速度: {speed:.1f} KB/s"
-        )
-        
-        # 更新状态文本
-        current_text = self.status_text.toPlainText()
-        lines = current_text.split('\n')
-        # 如果有超过4行的媒体下载信息，删除旧的
-        if len(lines) > 4:
-            lines = lines[:4]
-        lines.append(status)
-        self.status_text.setText('\n'.join(lines))
-        self.status_text.verticalScrollBar().setValue(
-            self.status_text.verticalScrollBar().maximum()
+        downloads = snapshot['downloads']
+        received = sum(item['received'] for item in downloads.values())
+        total = sum(item['total'] for item in downloads.values())
+        self.media_progress_bar.setValue(int(received / total * 100) if total else 0)
+        for item in list(downloads.values())[:4]:
+            lines.append(
+                f"正在下载{media_type_names.get(item['media_type'], item['media_type'])}: {item['filename']} "
+                f"{item['percentage']:.1f}% ({self.format_size(item['received'])}/{self.format_size(item['total'])})"
+            )
+        lines.append(
+            f"处理速率 {snapshot['events_per_second']:.0f} 条/秒，"
+            f"已下载 {snapshot['downloads_done']} 个文件 ({self.format_size(snapshot['bytes_done'])})，"
+            f"下载速度 {snapshot['download_speed']:.1f} KB/s"
         )
+        self.status_label.setText('\n'.join(lines))
 
     def format_size(self, size):
         """格式化文件大小显示"""
@@ -351,84 +538,93 @@ class MainWindow(QMainWindow):
             size /= 1024
         return f"{size:.1f} TB"
 
-    def crawling_finished(self, messages):
-        self.messages = messages
-        self.status_text.setText("爬取完成!")
+    def crawling_finished(self, stats):
+        self.stop_progress()
+        self.log_view.log(f"爬取完成! 本次处理 {stats['total']} 条消息")
         self.start_button.setEnabled(True)
+        self.sync_button.setEnabled(True)
+        self.media_queue_button.setEnabled(True)
         self.export_button.setEnabled(True)
+        self.export_parquet_button.setEnabled(True)
         
-        # 显示统计信息
-        self.show_statistics()
+        # 显示统计信息：本次运行覆盖了全部已保存的消息时直接使用累计的统计，不必再查询
+        if stats['total'] != self.data_processor.count_messages(self.current_group_ids):
+            stats = None
+        self.show_statistics(stats)
         
         # 更新消息预览
-        self.message_list.clear()
-        for msg in messages[:100]:  # 只显示前100条消息预览
-            item = QListWidgetItem(
-                f"[{msg['date'].strftime('%Y-%m-%d %H:%M')}] {msg['sender_name']}: "
-                f"{msg['text'][:50]}{'...' if len(msg['text']) > 50 else ''}"
-            )
-            item.setData(Qt.ItemDataRole.UserRole, msg)
-            self.message_list.addItem(item)
+        self.message_model.set_groups(self.current_group_ids)
         
     def crawling_error(self, error_message):
-        self.status_text.setText(f"错误: {error_message}")
+        self.stop_progress()
+        self.log_view.log(f"错误: {error_message}", 'error')
         self.start_button.setEnabled(True)
+        self.sync_button.setEnabled(True)
+        self.media_queue_button.setEnabled(True)
         self.progress_bar.setValue(0)
         
         # 根据不同错误类型给出具体提示
         if "服务器错误" in error_message:
-            self.status_text.append("\n服务器连接不稳定，请稍后重试")
+            self.log_view.log("服务器连接不稳定，请稍后重试")
         elif "连接Telegram失败" in error_message:
-            self.status_text.append("\n请确保：\n1. 已开启代理服务\n2. 代理端口正确(默认3067)\n3. 网络连接稳定")
+            self.log_view.log("请确保：\n1. 已开启代理服务\n2. 代理端口正确(默认3067)\n3. 网络连接稳定")
         elif "无法获取群组信息" in error_message:
-            self.status_text.append("\n群组ID可以是：\n1. 数字ID\n2. 用户名(如 @groupname)\n3. 邀请链接(如 t.me/groupname)")
+            self.log_view.log("群组ID可以是：\n1. 数字ID\n2. 用户名(如 @groupname)\n3. 邀请链接(如 t.me/groupname)")
         elif "需要两步验证密码" in error_message:
-            self.status_text.append("\n请先在Telegram客户端完成两步验证")
+            self.log_view.log("请先在Telegram客户端完成两步验证")
 
-    def show_statistics(self):
-        if not hasattr(self, 'messages'):
+    def show_statistics(self, stats=None):
+        if not self.current_group_ids:
             return
             
-        df = pd.DataFrame(self.messages)
+        # 统计直接在存储的索引上查询，不需要加载全部消息
+        if stats is None:
+            stats = self.data_processor.statistics(self.current_group_ids)
+        if not stats['total']:
+            return
+        self.stats_text.setText(self.format_statistics(stats))
         
+    def format_statistics(self, stats):
+        """把统计结果格式化为文本"""
         # 基础统计
         basic_stats = f"""基础统计:
-        总消息数: {len(df)}
-        发言人数: {df['sender_id'].nunique()}
-        包含媒体消息数: {df['media_type'].notna().sum()}
-        平均查看数: {df['views'].mean():.2f}
+        总消息数: {stats['total']}
+        发言人数: {stats['senders']}
+        包含媒体消息数: {stats['media']}
+        平均查看数: {stats['avg_views']:.2f}
         """
         
         # 活跃用户统计
-        top_users = df['sender_name'].value_counts().head(5)
         user_stats = "\n\n活跃用户 (Top 5):\n"
-        for name, count in top_users.items():
+        for name, count in stats['top_senders']:
             user_stats += f"{name}: {count}条消息\n"
         
         # 媒体类型统计
-        if 'media_type' in df.columns:
-            media_stats = df['media_type'].value_counts()
-            media_text = "\n\n媒体类型统计:\n"
-            for type_name, count in media_stats.items():
-                if pd.notna(type_name):
-                    media_text += f"{type_name}: {count}个\n"
+        media_text = "\n\n媒体类型统计:\n"
+        for type_name, count in stats['media_types'].items():
+            media_text += f"{type_name}: {count}个\n"
         
         # 时间分布
-        if 'date' in df.columns:
-            df['hour'] = df['date'].apply(lambda x: x.hour)
-            hour_stats = df['hour'].value_counts().sort_index()
-            time_text = "\n\n消息时间分布 (小时):\n"
-            max_count = hour_stats.max()
-            for hour, count in hour_stats.items():
+        time_text = "\n\n消息时间分布 (小时):\n"
+        if stats['hours']:
+            max_count = max(stats['hours'].values())
+            for hour, count in stats['hours'].items():
                 bar_length = int((count / max_count) * 20)
                 time_text += f"{hour:02d}时: {'█' * bar_length} ({count}条)\n"
         
+        # 日期分布（最近 7 天）
+        day_text = ""
+        if stats.get('days'):
+            day_text = "\n\n消息日期分布 (最近7天):\n"
+            for day, count in list(stats['days'].items())[-7:]:
+                day_text += f"{day}: {count}条\n"
+        
         # 合并所有统计信息
-        self.stats_text.setText(basic_stats + user_stats + media_text + time_text)
+        return basic_stats + user_stats + media_text + time_text + day_text
 
     def export_data(self):
-        if not hasattr(self, 'messages'):
-            self.status_text.setText("没有可导出的数据")
+        if not self.current_group_ids or not self.data_processor.count_messages(self.current_group_ids):
+            self.log_view.log("没有可导出的数据", 'warning', '导出')
             return
             
         try:
@@ -445,8 +641,11 @@ class MainWindow(QMainWindow):
             if not file_path:  # 用户取消了保存
                 return
             
-            # 创建DataFrame并处理时区
-            df = pd.DataFrame(self.messages)
+            # pandas 只在导出时加载，避免拖慢启动
+            import pandas as pd
+            
+            # 从存储中按时间顺序读取消息，创建DataFrame并处理时区
+            df = pd.DataFrame(self.data_processor.load_messages(self.current_group_ids))
             
             # 处理日期时间格式
             if 'date' in df.columns:
@@ -485,10 +684,26 @@ class MainWindow(QMainWindow):
                 sender_stats = sender_stats.sort_values('发言次数', ascending=False)  # 按发言次数排序
                 sender_stats.to_excel(writer, sheet_name='发言人统计', index=False)
             
-            self.status_text.setText(f"数据已导出到: {file_path}")
+            self.log_view.log(f"数据已导出到: {file_path}", stage='导出')
+            
+        except Exception as e:
+            self.log_view.log(f"导出失败: {str(e)}", 'error', '导出')
+
+    def export_parquet(self):
+        """导出为按日期分区的 Parquet 文件"""
+        if not self.current_group_ids or not self.data_processor.count_messages(self.current_group_ids):
+            self.log_view.log("没有可导出的数据", 'warning', '导出')
+            return
+            
+        root_dir = QFileDialog.getExistingDirectory(self, "选择Parquet导出目录")
+        if not root_dir:  # 用户取消了选择
+            return
             
+        try:
+            count = self.data_processor.export_parquet(self.current_group_ids, root_dir)
+            self.log_view.log(f"已导出 {count} 条消息到: {root_dir}", stage='导出')
         except Exception as e:
-            self.status_text.setText(f"导出失败: {str(e)}") 
+            self.log_view.log(f"导出失败: {str(e)}", 'error', '导出')
 
     def load_saved_config(self):
         """加载保存的配置"""
@@ -521,18 +736,106 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         """窗口关闭时保存配置"""
         self.save_current_config()
+        sys.stdout = self.original_stdout
         event.accept()
 
     def show_proxy_settings(self):
         """显示代理设置对话框"""
+        from src.proxy_dialog import ProxyDialog
+        
         dialog = ProxyDialog(self, getattr(self, 'proxy_config', None))
         if dialog.exec() == QDialog.DialogCode.Accepted:
             self.proxy_config = dialog.get_config()
             # 保存配置
             self.save_current_config()
             
-    def show_message_detail(self, item):
+    def load_media_policy(self):
+        """读取配置文件中的媒体下载策略，未配置时返回 None，配置无效时提示并返回 False"""
+        config = self.config_manager.load_media_policy()
+        if not config:
+            return None
+        from src.media_policy import MediaPolicy
+        
+        try:
+            return MediaPolicy.from_dict(config)
+        except Exception as e:
+            self.log_view.log(f"媒体策略配置无效: {str(e)}", 'error')
+            return False
+            
+    def show_media_queue(self):
+        """列出仅记录了信息或下载失败的媒体，选中后加入下载队列并开始下载"""
+        from src.media_selection_dialog import MediaSelectionDialog
+        from src.media_queue import MediaQueue
+        
+        group_ids = [g for g in re.split(r'[,，\s]+', self.group_id_input.text().strip()) if g]
+        media_queue = MediaQueue()
+        try:
+            items = media_queue.list(group_ids or None, ['deferred', 'failed'])
+        finally:
+            media_queue.close()
+        if not items:
+            self.log_view.log("媒体队列中没有待下载的媒体，请先勾选“仅记录媒体信息”进行采集", 'warning')
+            return
+            
+        dialog = MediaSelectionDialog(items, self)
+        dialog.download_requested.connect(self.download_selected_media)
+        dialog.exec()
+        
+    def download_selected_media(self, items):
+        """将选中的媒体加入下载队列并在后台下载"""
+        api_id = self.api_id_input.text().strip()
+        api_hash = self.api_hash_input.text().strip()
+        if not all([api_id, api_hash]):
+            self.log_view.log("请填写 API ID 和 API Hash", 'error')
+            return
+            
+        media_policy = self.load_media_policy()
+        if media_policy is False:
+            return
+            
+        from src.media_queue import MediaQueue
+        
+        media_queue = MediaQueue()
+        try:
+            media_queue.enqueue(items)
+        finally:
+            media_queue.close()
+            
+        self.media_thread = MediaDownloadThread(api_id, api_hash, getattr(self, 'proxy_config', None), media_policy)
+        self.watch_progress(self.media_thread.progress)
+        self.media_thread.finished.connect(self.media_download_finished)
+        self.media_thread.error.connect(self.crawling_error)
+        
+        self.start_button.setEnabled(False)
+        self.sync_button.setEnabled(False)
+        self.media_queue_button.setEnabled(False)
+        self.log_view.log(f"正在下载 {len(items)} 个媒体文件...", stage='下载')
+        self.media_thread.start()
+        
+    def media_download_finished(self, stats):
+        self.stop_progress()
+        self.log_view.log(f"媒体下载完成：成功 {stats['done']} 个，失败 {stats['failed']} 个", stage='下载')
+        self.start_button.setEnabled(True)
+        self.sync_button.setEnabled(True)
+        self.media_queue_button.setEnabled(True)
+        
+    def apply_message_filters(self):
+        """按发送者、媒体类型和时间范围过滤消息预览"""
+        date_from = date_to = None
+        if self.date_filter_enabled.isChecked():
+            date_from = self.date_filter_from.dateTime().toPyDateTime().astimezone()
+            date_to = self.date_filter_to.dateTime().toPyDateTime().astimezone()
+        self.message_model.set_filters(
+            sender=self.sender_filter.text().strip() or None,
+            media_type=self.media_filter.currentData(),
+            date_from=date_from,
+            date_to=date_to
+        )
+        
+    def show_message_detail(self, index):
         """显示消息详情"""
-        message = item.data(Qt.ItemDataRole.UserRole)
+        from src.message_detail_dialog import MessageDetailDialog
+        
+        message = self.message_model.message(index.row())
         detail_dialog = MessageDetailDialog(message, self)
         detail_dialog.exec() 
\ No newline at end of file
@@ -0,0 +1,134 @@
+import fnmatch
+
+
+def image_sizes(sizes):
+    """把照片尺寸或文档缩略图整理为 [(尺寸对象, 长边像素, 字节数)]，按长边和大小从小到大排序
+
+    只保留能按 type 下载的尺寸（PhotoSize 和 PhotoSizeProgressive）：内嵌在消息中的预览图
+    （stripped/cached）、空尺寸和轮廓（PhotoPathSize）都没有宽高或文件大小，不计入。
+    """
+    result = []
+    for size in sizes or []:
+        if not getattr(size, 'type', None) or not getattr(size, 'w', None) or not getattr(size, 'h', None):
+            continue
+        if getattr(size, 'bytes', None) is not None:
+            continue
+        length = getattr(size, 'size', None)
+        if length is None:
+            # 渐进式 JPEG（PhotoSizeProgressive）记录各级大小，完整下载为最后一级
+            length = max(getattr(size, 'sizes', None) or [0])
+        if not length:
+            continue
+        result.append((size, max(size.w, size.h), length))
+    return sorted(result, key=lambda item: (item[1], item[2]))
+
+
+class MediaPolicy:
+    """媒体下载策略
+
+    在请求任何数据之前决定媒体是否下载、下载哪个尺寸：
+    - types: 允许下载的媒体类型，为空时不限
+    - max_size / type_max_size: 全局和按类型的大小上限（字节），按实际要下载的尺寸计算
+    - mime_allow / mime_deny: MIME 类型白名单和黑名单，支持通配符，如 image/*
+    - variants: 按类型选择下载的尺寸，'full' 为原文件，'thumb' 只下载缩略图
+      （照片为最小的尺寸，文档/视频为最大的缩略图），整数 N 为长边不小于 N 像素的
+      最小尺寸（没有时取最大尺寸）
+    - group_max_files / group_max_bytes: 每个群组在一次运行中最多下载的文件数和字节数
+
+    可由配置文件中的 media_policy 通过 from_dict 创建，大小以 MB 为单位。
+    """
+
+    def __init__(self, types=None, max_size=None, type_max_size=None, mime_allow=None, mime_deny=None,
+                 variants=None, group_max_files=None, group_max_bytes=None):
+        self.types = set(types) if types else None
+        self.max_size = max_size
+        self.type_max_size = type_max_size or {}
+        self.mime_allow = mime_allow or []
+        self.mime_deny = mime_deny or []
+        self.variants = variants or {}
+        self.group_max_files = group_max_files
+        self.group_max_bytes = group_max_bytes
+        self._group_usage = {}  # group_id -> [文件数, 字节数]
+        self.skipped = 0  # 被策略跳过的媒体数
+
+    @classmethod
+    def from_dict(cls, config):
+        """从配置创建，例如
+        {"types": ["photo", "video"], "max_size_mb": 20, "type_max_size_mb": {"video": 50},
+         "mime_deny": ["application/x-msdownload"], "variants": {"photo": 800, "video": "thumb"},
+         "group_max_files": 1000, "group_max_mb": 2048}
+        """
+        def to_bytes(value):
+            return int(value * 1024 * 1024) if value is not None else None
+
+        for media_type, variant in (config.get('variants') or {}).items():
+            if variant not in ('full', 'thumb') and not isinstance(variant, int):
+                raise Exception(f"无效的媒体尺寸设置 {media_type}: {variant}")
+        return cls(
+            types=config.get('types'),
+            max_size=to_bytes(config.get('max_size_mb')),
+            type_max_size={
+                media_type: to_bytes(size) for media_type, size in (config.get('type_max_size_mb') or {}).items()
+            },
+            mime_allow=config.get('mime_allow'),
+            mime_deny=config.get('mime_deny'),
+            variants=config.get('variants'),
+            group_max_files=config.get('group_max_files'),
+            group_max_bytes=to_bytes(config.get('group_max_mb'))
+        )
+
+    def _image_sizes(self, message, media_type):
+        """可下载的图片尺寸：照片的各个尺寸或文档的缩略图"""
+        if media_type == 'photo':
+            return image_sizes(getattr(message.photo, 'sizes', None))
+        return image_sizes(getattr(message.document, 'thumbs', None))
+
+    def choose(self, message, media_type, full_size):
+        """选择要下载的尺寸，返回 (thumb, 字节数)：thumb 为 None 表示下载原文件，
+        否则为尺寸的 type（如 'm'、'x'），作为 download_media 的 thumb 参数。
+        download_media 不接受 PhotoSizeProgressive 等尺寸对象，按 type 可以下载任意一种尺寸。
+        没有符合要求的尺寸时返回 None
+        """
+        variant = self.variants.get(media_type, 'full')
+        if variant == 'full':
+            return None, full_size
+        sizes = self._image_sizes(message, media_type)
+        if not sizes:
+            return None
+        if variant == 'thumb':
+            size = sizes[0] if media_type == 'photo' else sizes[-1]
+        else:
+            size = next((item for item in sizes if item[1] >= variant), sizes[-1])
+        # 照片的最大尺寸就是原图
+        if media_type == 'photo' and size is sizes[-1]:
+            return None, full_size
+        return size[0].type, size[2]
+
+    def check(self, group_id, media_type, size, mime_type):
+        """检查媒体是否允许下载，不允许时返回原因"""
+        if self.types is not None and media_type not in self.types:
+            return f"类型 {media_type} 不在下载范围内"
+        limit = self.type_max_size.get(media_type, self.max_size)
+        if limit is not None and size > limit:
+            return f"大小 {size} 字节超出上限 {limit} 字节"
+        if self.mime_deny and mime_type and any(fnmatch.fnmatch(mime_type, pattern) for pattern in self.mime_deny):
+            return f"MIME 类型 {mime_type} 被禁止"
+        if self.mime_allow and not (mime_type and any(fnmatch.fnmatch(mime_type, pattern) for pattern in self.mime_allow)):
+            return f"MIME 类型 {mime_type} 不在允许范围内"
+        files, total = self._group_usage.get(str(group_id), (0, 0))
+        if self.group_max_files is not None and files >= self.group_max_files:
+            return f"群组已达到 {self.group_max_files} 个文件的上限"
+        if self.group_max_bytes is not None and total + size > self.group_max_bytes:
+            return f"群组已达到 {self.group_max_bytes} 字节的上限"
+        return None
+
+    def admit(self, group_id, media_type, size, mime_type):
+        """检查并计入群组用量，允许下载时返回 None，否则返回原因"""
+        reason = self.check(group_id, media_type, size, mime_type)
+        if reason:
+            self.skipped += 1
+            return reason
+        usage = self._group_usage.setdefault(str(group_id), [0, 0])
+        usage[0] += 1
+        usage[1] += size
+        return None
@@ -0,0 +1,185 @@
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+
+class MediaQueue:
+    """持久化的媒体下载队列
+
+    仅记录元数据的爬取把每个媒体登记为 deferred（已知但未请求下载）；通过选择对话框或
+    规则选中的媒体变为 queued，由 TelegramCrawler.drain_media_queue 在之后按队列下载。
+    状态依次为 deferred → queued → downloading → done / failed，下载失败时重新排队，
+    超过 max_attempts 次后标记为 failed。登记的记录先缓存在内存中，批量写入。
+    """
+
+    STATUSES = ['deferred', 'queued', 'downloading', 'done', 'failed']
+
+    def __init__(self, db_path="data/media_queue.db", max_attempts=3, batch_size=100):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self._pending = []  # 待写入的 (数据行, 是否排队)
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        # 下载线程与界面线程共用
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS media_queue (
+                    group_id TEXT NOT NULL,
+                    message_id INTEGER NOT NULL,
+                    media_type TEXT,
+                    media_size INTEGER,
+                    media_name TEXT,
+                    media_key TEXT,
+                    sender_name TEXT,
+                    date REAL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    media_path TEXT,
+                    error TEXT,
+                    updated_at REAL,
+                    PRIMARY KEY (group_id, message_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_media_queue_status ON media_queue (status);
+            """)
+
+    def add(self, row, queued=False):
+        """登记一条消息的媒体，queued 为 True 时直接加入下载队列"""
+        self._pending.append((row, queued))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """写入缓存的登记记录；已下载完成的记录保持不变"""
+        if not self._pending:
+            return
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO media_queue (group_id, message_id, media_type, media_size, media_name, media_key, "
+                "sender_name, date, status, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (group_id, message_id) DO UPDATE SET media_type = excluded.media_type, "
+                "media_size = excluded.media_size, media_name = excluded.media_name, media_key = excluded.media_key, "
+                "sender_name = excluded.sender_name, date = excluded.date, "
+                "status = CASE WHEN excluded.status = 'queued' AND media_queue.status IN ('deferred', 'failed') "
+                "THEN 'queued' ELSE media_queue.status END, "
+                # 重新排队的媒体与 enqueue 一样从头计算失败次数（SET 中的列引用均为更新前的值）
+                "attempts = CASE WHEN excluded.status = 'queued' AND media_queue.status IN ('deferred', 'failed') "
+                "THEN 0 ELSE media_queue.attempts END, updated_at = excluded.updated_at",
+                [
+                    (str(row['group']), row['id'], row['media_type'], row.get('media_size'), row.get('media_name'),
+                     row.get('media_key'), row.get('sender_name'), row['date'].timestamp(),
+                     'queued' if queued else 'deferred', now)
+                    for row, queued in self._pending
+                ]
+            )
+        self._pending = []
+
+    def _to_item(self, record):
+        """转换为媒体选择对话框使用的字典"""
+        return {
+            'group': record[0],
+            'id': record[1],
+            'media_type': record[2] or '',
+            'size': record[3] or 0,
+            'filename': record[4] or f"{record[2]}_{record[1]}",
+            'media_key': record[5],
+            'sender_name': record[6] or '',
+            'date': datetime.fromtimestamp(record[7], tz=timezone.utc),
+            'status': record[8],
+            'attempts': record[9],
+            'media_path': record[10]
+        }
+
+    _SELECT = (
+        "SELECT group_id, message_id, media_type, media_size, media_name, media_key, sender_name, date, "
+        "status, attempts, media_path FROM media_queue"
+    )
+
+    def list(self, group_ids=None, statuses=None, limit=1000, offset=0):
+        """按时间倒序列出登记的媒体，可按群组和状态过滤"""
+        self.flush()
+        clauses = []
+        params = []
+        if group_ids:
+            clauses.append(f"group_id IN ({', '.join('?' * len(group_ids))})")
+            params.extend(str(g) for g in group_ids)
+        if statuses:
+            clauses.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = self.conn.execute(
+            self._SELECT + where + " ORDER BY date DESC LIMIT ? OFFSET ?", params + [limit, offset]
+        )
+        return [self._to_item(record) for record in cursor]
+
+    def enqueue(self, items):
+        """把选中的媒体加入下载队列，items 为包含 group 和 id 的字典"""
+        self.flush()
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE media_queue SET status = 'queued', attempts = 0, updated_at = ? "
+                "WHERE group_id = ? AND message_id = ? AND status IN ('deferred', 'failed')",
+                [(time.time(), str(item['group']), item['id']) for item in items]
+            )
+
+    def claim(self, limit=50):
+        """取出一批排队中的媒体并标记为 downloading"""
+        self.flush()
+        with self.conn:
+            records = self.conn.execute(
+                self._SELECT + " WHERE status = 'queued' ORDER BY date LIMIT ?", (limit,)
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE media_queue SET status = 'downloading', updated_at = ? WHERE group_id = ? AND message_id = ?",
+                [(time.time(), record[0], record[1]) for record in records]
+            )
+        return [self._to_item(record) for record in records]
+
+    def mark_done(self, group_id, message_id, media_path):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE media_queue SET status = 'done', media_path = ?, error = NULL, updated_at = ? "
+                "WHERE group_id = ? AND message_id = ?",
+                (media_path, time.time(), str(group_id), message_id)
+            )
+
+    def mark_failed(self, group_id, message_id, error, permanent=False):
+        """记录一次失败，未超过最大次数时重新排队"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE media_queue SET attempts = attempts + 1, error = ?, updated_at = ?, "
+                "status = CASE WHEN ? OR attempts + 1 >= ? THEN 'failed' ELSE 'queued' END "
+                "WHERE group_id = ? AND message_id = ?",
+                (error, time.time(), permanent, self.max_attempts, str(group_id), message_id)
+            )
+
+    def reset_stale(self):
+        """上次运行中断时仍为 downloading 的媒体重新排队"""
+        with self.conn:
+            return self.conn.execute(
+                "UPDATE media_queue SET status = 'queued' WHERE status = 'downloading'"
+            ).rowcount
+
+    def counts(self, group_ids=None):
+        """各状态的媒体数量"""
+        self.flush()
+        where = ""
+        params = []
+        if group_ids:
+            where = f" WHERE group_id IN ({', '.join('?' * len(group_ids))})"
+            params = [str(g) for g in group_ids]
+        counts = dict.fromkeys(self.STATUSES, 0)
+        counts.update(self.conn.execute(
+            f"SELECT status, COUNT(*) FROM media_queue{where} GROUP BY status", params
+        ).fetchall())
+        return counts
+
+    def close(self):
+        self.flush()
+        self.conn.close()
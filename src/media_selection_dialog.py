@@ -1,6 +1,6 @@
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, 
                            QTableWidgetItem, QPushButton, QHeaderView, QCheckBox,
-                           QLabel, QProgressBar)
+                           QLabel, QProgressBar, QWidget)
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QPixmap
 import os
@@ -54,13 +54,14 @@ class MediaSelectionDialog(QDialog):
         layout.addLayout(button_layout)
         
         # 下载进度部分
-        self.progress_layout = QVBoxLayout()
+        self.progress_widget = QWidget()
+        self.progress_layout = QVBoxLayout(self.progress_widget)
         self.progress_label = QLabel()
         self.progress_bar = QProgressBar()
         self.progress_layout.addWidget(self.progress_label)
         self.progress_layout.addWidget(self.progress_bar)
-        self.progress_layout.setVisible(False)
-        layout.addLayout(self.progress_layout)
+        self.progress_widget.setVisible(False)
+        layout.addWidget(self.progress_widget)
         
     def format_size(self, size):
         """格式化文件大小"""
@@ -109,6 +110,6 @@ class MediaSelectionDialog(QDialog):
         
     def update_progress(self, current, total, filename):
         """更新下载进度"""
-        self.progress_layout.setVisible(True)
+        self.progress_widget.setVisible(True)
         self.progress_label.setText(f"正在下载: {filename}")
         self.progress_bar.setValue(int((current / total) * 100)) 
\ No newline at end of file
@@ -0,0 +1,120 @@
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+
+class MessageTableModel(QAbstractTableModel):
+    """消息预览的表格模型，数据按需从消息存储分页读取
+
+    视图滚动到底部时 Qt 调用 canFetchMore/fetchMore，每次只查询 page_size 行；
+    按时间或ID排序时用上一页最后一行继续查询（键集分页），翻到多深都只读取一页。
+    排序和过滤（发送者、时间范围、媒体类型）都交给存储在查询中完成，
+    不会为每一行创建控件，百万级消息也只保留已经滚动浏览过的行。
+    """
+
+    COLUMNS = [
+        ('date', "时间"),
+        ('sender_name', "发送者"),
+        ('text', "内容"),
+        ('media_type', "媒体"),
+        ('views', "查看数")
+    ]
+
+    def __init__(self, data_processor, page_size=200, parent=None):
+        super().__init__(parent)
+        self.data_processor = data_processor
+        self.page_size = page_size
+        self.group_ids = []
+        self.filters = {}
+        self.order_by = 'date'
+        self.descending = True  # 默认最新的消息在前
+        self._rows = []
+        self._exhausted = True
+
+    def set_groups(self, group_ids):
+        """切换要显示的群组并从头加载"""
+        self.group_ids = list(group_ids)
+        self.refresh()
+
+    def set_filters(self, sender=None, media_type=None, date_from=None, date_to=None):
+        """设置过滤条件，为空的条件不过滤"""
+        self.filters = {
+            key: value for key, value in (
+                ('sender', sender), ('media_type', media_type), ('date_from', date_from), ('date_to', date_to)
+            ) if value
+        }
+        self.refresh()
+
+    def refresh(self):
+        """清空已加载的行，视图随后通过 fetchMore 重新加载第一页"""
+        self.beginResetModel()
+        self._rows = []
+        self._exhausted = not self.group_ids
+        self.endResetModel()
+
+    def message(self, row):
+        """第 row 行的完整消息数据"""
+        return self._rows[row]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section][1]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        message = self._rows[index.row()]
+        field = self.COLUMNS[index.column()][0]
+        if role == Qt.ItemDataRole.DisplayRole:
+            value = message[field]
+            if field == 'date':
+                return value.strftime('%Y-%m-%d %H:%M') if value else ''
+            if field == 'text':
+                # 只显示第一行的前 100 个字符，完整内容在详情中查看
+                return (value or '').split('\n', 1)[0][:100]
+            return '' if value is None else str(value)
+        if role == Qt.ItemDataRole.ToolTipRole and field == 'text':
+            return (message['text'] or '')[:1000]
+        if role == Qt.ItemDataRole.UserRole:
+            return message
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        after = None
+        if self._rows and self.order_by in ('date', 'id'):
+            last = self._rows[-1]
+            after = (last[self.order_by], last['id'])
+        rows = self.data_processor.query_messages(
+            self.group_ids,
+            offset=len(self._rows),
+            limit=self.page_size,
+            order_by=self.order_by,
+            descending=self.descending,
+            after=after,
+            **self.filters
+        )
+        if len(rows) < self.page_size:
+            self._exhausted = True
+        if not rows:
+            return
+        self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        """在存储中按该列重新排序查询，内容列不参与排序"""
+        if self.COLUMNS[column][0] == 'text':
+            return
+        self.order_by = self.COLUMNS[column][0]
+        self.descending = order == Qt.SortOrder.DescendingOrder
+        self.refresh()
@@ -0,0 +1,117 @@
+import os
+from collections import OrderedDict
+
+
+class ParquetWriter:
+    """按 group/date 分区流式写入 Parquet
+
+    目录结构为 root_dir/group=<群组>/day=<YYYY-MM-DD>/part-NNNNN.parquet，
+    每个分区缓存 row_group_size 行后写出一个行组，sender_name、media_type 等
+    低基数列使用字典编码。所有分区缓存的总行数超过 max_buffered_rows 时全部写出；
+    同时打开的分区文件数量有限，超出时关闭最久未写入的文件，之后再写入该分区会生成新的 part 文件。
+
+    需要安装 pyarrow。
+    """
+
+    DICTIONARY_COLUMNS = ['sender_name', 'username', 'media_type', 'media_status']
+
+    def __init__(self, root_dir="data/parquet", row_group_size=10000, max_open_files=32, compression="zstd",
+                 max_buffered_rows=50000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise Exception("导出 Parquet 需要安装 pyarrow: pip install pyarrow")
+        self.pa = pa
+        self.pq = pq
+        self.root_dir = root_dir
+        self.row_group_size = row_group_size
+        self.max_open_files = max_open_files
+        self.compression = compression
+        self.max_buffered_rows = max_buffered_rows
+        self.rows_written = 0
+        self._buffered = 0
+        self._buffers = {}  # (group, date) -> 待写出的行
+        self._writers = OrderedDict()  # (group, date) -> 已打开的 pq.ParquetWriter
+
+        dictionary = pa.dictionary(pa.int32(), pa.string())
+        self.schema = pa.schema([
+            ('id', pa.int64()),
+            ('sender_id', pa.int64()),
+            ('username', dictionary),
+            ('sender_name', dictionary),
+            ('date', pa.timestamp('us', tz='UTC')),
+            ('text', pa.string()),
+            ('views', pa.int64()),
+            ('media_type', dictionary),
+            ('media_path', pa.string()),
+            ('media_status', dictionary),
+            ('media_size', pa.int64()),
+            ('media_name', pa.string()),
+            ('media_key', pa.string())
+        ])
+
+    def _partition_dir(self, group_id, day):
+        safe_group = "".join(c for c in str(group_id) if c.isalnum() or c in ('-', '_', '@'))
+        return os.path.join(self.root_dir, f"group={safe_group}", f"day={day}")
+
+    def _open_writer(self, key):
+        """打开分区的写入器，超过上限时关闭最久未使用的写入器"""
+        if key in self._writers:
+            self._writers.move_to_end(key)
+            return self._writers[key]
+
+        partition_dir = self._partition_dir(*key)
+        os.makedirs(partition_dir, exist_ok=True)
+        part = len([name for name in os.listdir(partition_dir) if name.endswith('.parquet')])
+        path = os.path.join(partition_dir, f"part-{part:05d}.parquet")
+        writer = self.pq.ParquetWriter(
+            path,
+            self.schema,
+            compression=self.compression,
+            use_dictionary=self.DICTIONARY_COLUMNS
+        )
+        self._writers[key] = writer
+
+        while len(self._writers) > self.max_open_files:
+            _, oldest = self._writers.popitem(last=False)
+            oldest.close()
+        return writer
+
+    def write(self, rows):
+        """缓存消息行，分区缓存满一个行组时写出"""
+        for row in rows:
+            key = (row['group'], row['date'].strftime('%Y-%m-%d'))
+            buffer = self._buffers.setdefault(key, [])
+            buffer.append(row)
+            self._buffered += 1
+            if len(buffer) >= self.row_group_size:
+                self._flush_partition(key)
+            elif self._buffered >= self.max_buffered_rows:
+                self.flush()
+
+    def _flush_partition(self, key):
+        """将一个分区的缓存写出为行组"""
+        rows = self._buffers.pop(key, None)
+        if not rows:
+            return
+        self._buffered -= len(rows)
+        columns = {
+            name: [row.get(name) for row in rows]
+            for name in self.schema.names
+        }
+        table = self.pa.Table.from_pydict(columns, schema=self.schema)
+        self._open_writer(key).write_table(table, row_group_size=self.row_group_size)
+        self.rows_written += len(rows)
+
+    def flush(self):
+        """写出全部缓存"""
+        for key in list(self._buffers):
+            self._flush_partition(key)
+
+    def close(self):
+        """写出缓存并关闭所有文件"""
+        self.flush()
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import deque
+
+
+class ProgressAggregator:
+    """合并爬虫线程的进度事件，供界面按固定帧率读取快照
+
+    爬虫线程每处理一条消息或每次下载进度变化都会调用回调，这里只在加锁后覆盖最新状态，
+    开销与界面无关；界面用定时器调用 snapshot()，无论消息速率多高，每帧只重绘一次。
+    快照包含总体进度、最近的状态行、各群组进度、正在下载的文件以及累计计数和速率。
+    下载失败时不会收到 100% 的回调，超过 stale_after 秒没有更新的下载不再显示。
+    """
+
+    def __init__(self, max_lines=10, stale_after=30.0):
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._lines = deque(maxlen=max_lines)  # 最近的状态行
+        self._progress = 0.0
+        self._groups = {}  # group_id -> (进度, 状态)
+        self._downloads = {}  # message_id -> 下载状态
+        self._events = 0  # 收到的进度事件数，每处理一条消息计一次
+        self._downloads_done = 0
+        self._bytes_done = 0
+        self._version = 0  # 每次更新加一，界面据此判断是否需要重绘
+        self._rate_sample = (time.monotonic(), 0)
+        self._rate = 0.0
+
+    def update(self, progress, message):
+        """总体进度回调，签名与 progress_callback 相同"""
+        with self._lock:
+            self._progress = progress
+            self._events += 1
+            if not self._lines or self._lines[-1] != message:
+                self._lines.append(message)
+            self._version += 1
+
+    def update_group(self, group_id, progress, message):
+        """单个群组的进度回调，签名与 group_progress_callback 相同"""
+        with self._lock:
+            self._groups[group_id] = (progress, message)
+            self._events += 1
+            self._version += 1
+
+    def update_media(self, message_id, percentage, speed, media_type, filename, received, total):
+        """下载进度回调，签名与 download_progress_callback 相同，100% 时计为完成"""
+        with self._lock:
+            if percentage >= 100:
+                self._downloads.pop(message_id, None)
+                self._downloads_done += 1
+                self._bytes_done += total
+            else:
+                self._downloads[message_id] = {
+                    'percentage': percentage,
+                    'speed': speed,
+                    'media_type': media_type,
+                    'filename': filename,
+                    'received': received,
+                    'total': total,
+                    'updated_at': time.monotonic()
+                }
+            self._version += 1
+
+    @property
+    def version(self):
+        return self._version
+
+    def snapshot(self):
+        """当前状态的快照（普通字典，可在界面线程中随意使用）"""
+        with self._lock:
+            now = time.monotonic()
+            sampled_at, sampled_events = self._rate_sample
+            if now - sampled_at >= 1.0:
+                self._rate = (self._events - sampled_events) / (now - sampled_at)
+                self._rate_sample = (now, self._events)
+            for message_id in [key for key, item in self._downloads.items() if now - item['updated_at'] > self.stale_after]:
+                del self._downloads[message_id]
+            downloads = dict(self._downloads)
+            return {
+                'version': self._version,
+                'progress': self._progress,
+                'lines': list(self._lines),
+                'groups': dict(self._groups),
+                'downloads': downloads,
+                'events': self._events,
+                'events_per_second': self._rate,
+                'downloads_done': self._downloads_done,
+                'bytes_done': self._bytes_done,
+                'download_speed': sum(item['speed'] for item in downloads.values())
+            }
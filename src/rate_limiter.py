@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from telethon.errors import FloodWaitError
+
+
+class TokenBucket:
+    """令牌桶，速率可在 [min_rate, max_rate] 范围内动态调整"""
+
+    def __init__(self, rate, capacity=None, min_rate=None, max_rate=None):
+        self.rate = rate  # 每秒补充的令牌数
+        self.capacity = capacity or max(rate, 1)
+        self.min_rate = min_rate or rate / 16
+        self.max_rate = max_rate or rate * 4
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0  # FloodWait 期间整类请求暂停
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, tokens=1):
+        """获取令牌，不足时等待"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """自适应限流器
+
+    每类请求（history 拉取历史、entity 获取实体、file 下载文件）使用独立的令牌桶。
+    请求成功时缓慢提高速率，遇到 FloodWait 时速率减半并暂停该类请求直到等待结束，
+    从而在不手动重启的情况下尽量贴近服务器限制运行。
+    """
+
+    DEFAULT_RATES = {
+        'history': 2.0,  # 每秒历史分页请求数
+        'entity': 2.0,  # 每秒实体查询请求数
+        'file': 10.0  # 每秒开始的下载数
+    }
+
+    def __init__(self, rates=None, increase_step=0.02, decrease_factor=0.5, max_flood_wait=3600, flood_callback=None):
+        self.increase_step = increase_step  # 每次成功后速率增加的比例
+        self.decrease_factor = decrease_factor  # 遇到 FloodWait 后速率乘以该系数
+        self.max_flood_wait = max_flood_wait  # 超过该时长的 FloodWait 不再自动等待
+        self.flood_callback = flood_callback  # flood_callback(request_class, seconds)，用于通知会话池暂停该账号
+        self.flood_waits = 0
+        self.buckets = {
+            request_class: TokenBucket(rate)
+            for request_class, rate in {**self.DEFAULT_RATES, **(rates or {})}.items()
+        }
+
+    def _bucket(self, request_class):
+        if request_class not in self.buckets:
+            self.buckets[request_class] = TokenBucket(1.0)
+        return self.buckets[request_class]
+
+    async def acquire(self, request_class, tokens=1):
+        """发起请求前获取令牌"""
+        await self._bucket(request_class).acquire(tokens)
+
+    def on_success(self, request_class):
+        """请求成功后小幅提高速率"""
+        bucket = self._bucket(request_class)
+        bucket.rate = min(bucket.max_rate, bucket.rate * (1 + self.increase_step))
+
+    async def on_flood_wait(self, request_class, seconds):
+        """遇到 FloodWait：降低速率并等待服务器要求的时间"""
+        if self.flood_callback:
+            self.flood_callback(request_class, seconds)
+        if seconds > self.max_flood_wait:
+            raise Exception(f"请求过于频繁，需要等待 {seconds} 秒")
+        self.flood_waits += 1
+        bucket = self._bucket(request_class)
+        bucket.rate = max(bucket.min_rate, bucket.rate * self.decrease_factor)
+        bucket.tokens = 0
+        bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + seconds)
+        print(f"触发 FloodWait ({request_class})，等待 {seconds} 秒，速率降至 {bucket.rate:.2f}/秒")
+        await asyncio.sleep(seconds)
+
+    async def call(self, request_class, func, *args, **kwargs):
+        """限流执行一次请求，遇到 FloodWait 时自动等待后重试"""
+        while True:
+            await self.acquire(request_class)
+            try:
+                result = await func(*args, **kwargs)
+            except FloodWaitError as e:
+                await self.on_flood_wait(request_class, e.seconds)
+                continue
+            self.on_success(request_class)
+            return result
+
+    def effective_rates(self):
+        """返回各类请求当前的有效速率（次/秒）"""
+        return {request_class: bucket.rate for request_class, bucket in self.buckets.items()}
+
+    def format_rates(self):
+        """格式化当前速率，用于状态显示"""
+        return ", ".join(f"{name} {rate:.2f}/秒" for name, rate in self.effective_rates().items())
@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+
+class SenderCache:
+    """发送者信息缓存
+
+    数据持久化在 SQLite 中，按用户 ID 索引，所有群组和每次运行共享；
+    内存中保留一个容量有限的 LRU 缓存，超过 ttl 秒的记录视为过期，需要重新获取。
+    """
+
+    def __init__(self, db_path="data/sender_cache.db", ttl=7 * 24 * 3600, max_memory=10000):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_memory = max_memory
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # user_id -> (user_info, updated_at)
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        # 爬虫线程与创建缓存的线程可能不同
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS senders (
+                user_id INTEGER PRIMARY KEY,
+                username TEXT,
+                first_name TEXT,
+                last_name TEXT,
+                display_name TEXT,
+                updated_at REAL
+            )
+        """)
+        self.conn.commit()
+
+    def _remember(self, user_id, user_info, updated_at):
+        """放入内存 LRU，超出容量时淘汰最久未使用的记录"""
+        self._memory[user_id] = (user_info, updated_at)
+        self._memory.move_to_end(user_id)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    def _is_fresh(self, updated_at):
+        return time.time() - updated_at < self.ttl
+
+    def get(self, user_id):
+        """获取未过期的发送者信息，不存在或已过期时返回 None"""
+        entry = self._memory.get(user_id)
+        if entry is not None:
+            if self._is_fresh(entry[1]):
+                self._memory.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            del self._memory[user_id]
+
+        row = self.conn.execute(
+            "SELECT username, first_name, last_name, display_name, updated_at FROM senders WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        if row and self._is_fresh(row[4]):
+            user_info = {
+                'username': row[0] or '',
+                'first_name': row[1] or '',
+                'last_name': row[2] or '',
+                'display_name': row[3] or ''
+            }
+            self._remember(user_id, user_info, row[4])
+            self.hits += 1
+            return user_info
+
+        self.misses += 1
+        return None
+
+    def set(self, user_id, user_info):
+        """写入单个发送者信息"""
+        self.set_many({user_id: user_info})
+
+    def set_many(self, items):
+        """在一个事务中批量写入 {user_id: user_info}"""
+        if not items:
+            return
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO senders (user_id, username, first_name, last_name, display_name, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (user_id, info['username'], info['first_name'], info['last_name'], info['display_name'], now)
+                    for user_id, info in items.items()
+                ]
+            )
+        for user_id, info in items.items():
+            self._remember(user_id, info, now)
+
+    def stats(self):
+        """返回缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'memory_size': len(self._memory)
+        }
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
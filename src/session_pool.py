@@ -0,0 +1,261 @@
+import asyncio
+import time
+
+from src.crawler import TelegramCrawler
+from src.data_processor import DataProcessor
+from src.rate_limiter import RateLimiter
+from src.sender_cache import SenderCache
+
+
+class SessionAccount:
+    """会话池中的一个已授权账号"""
+
+    def __init__(self, session_name, api_id, api_hash, proxy=None):
+        self.session_name = session_name
+        self.api_id = int(api_id)
+        self.api_hash = api_hash
+        self.proxy = proxy  # 为空时使用会话池的代理
+        self.crawler = None
+        self.entities = {}  # group_id -> 该账号下的群组实体（access_hash 因账号而异）
+        self.active = 0  # 正在执行的任务数
+        self.completed = 0  # 已完成的任务数
+        self.errors = 0  # 连续失败次数
+        self.flood_until = 0  # FloodWait 结束时间，之前不分配新任务
+        self.healthy = True
+
+    @property
+    def benched(self):
+        """是否处于 FloodWait 中"""
+        return time.monotonic() < self.flood_until
+
+    def status(self):
+        return {
+            'session': self.session_name,
+            'healthy': self.healthy,
+            'benched_seconds': max(0, int(self.flood_until - time.monotonic())),
+            'active': self.active,
+            'completed': self.completed,
+            'errors': self.errors
+        }
+
+
+class SessionPool:
+    """多账号会话池
+
+    accounts 为 [{'session': 会话名, 'api_id': ..., 'api_hash': ..., 'proxy': 可选}, ...]，
+    各账号需事先登录过（会话文件已授权）。
+    把群组（以及可选的消息ID分片）分发给多个已授权账号并行爬取。每个账号有独立的
+    客户端和限流器；账号触发 FloodWait 时暂停分配新任务，连续失败 max_errors 次后
+    标记为不健康并停止使用，失败的任务交给其他账号重试。任务按账号当前负载和已完成数
+    公平分配，所有账号共享消息存储和发送者缓存。
+    """
+
+    def __init__(self, accounts, download_path="downloads", proxy=None, tasks_per_account=2,
+                 max_errors=3, max_attempts=3, data_processor=None):
+        self.accounts = [
+            SessionAccount(account['session'], account['api_id'], account['api_hash'], account.get('proxy'))
+            for account in accounts
+        ]
+        if not self.accounts:
+            raise Exception("会话池中没有账号")
+        self.download_path = download_path
+        self.proxy = proxy
+        self.tasks_per_account = tasks_per_account  # 每个账号同时执行的任务数
+        self.max_errors = max_errors
+        self.max_attempts = max_attempts  # 单个任务最多尝试的次数
+        self.data_processor = data_processor or DataProcessor()
+        self.users_cache = SenderCache(f"{self.data_processor.save_dir}/sender_cache.db")
+        self._condition = None
+
+    def _bench(self, account, seconds):
+        """账号触发 FloodWait，等待期间不再分配新任务"""
+        account.flood_until = max(account.flood_until, time.monotonic() + seconds)
+        print(f"账号 {account.session_name} 触发 FloodWait，暂停 {seconds} 秒")
+
+    async def connect(self, download_progress_callback=None, parquet_dir=None):
+        """连接所有账号，未授权或无法连接的账号标记为不健康"""
+        for account in self.accounts:
+            account.crawler = TelegramCrawler(
+                account.api_id,
+                account.api_hash,
+                download_path=self.download_path,
+                proxy=account.proxy or self.proxy,
+                rate_limiter=RateLimiter(
+                    flood_callback=lambda request_class, seconds, account=account: self._bench(account, seconds)
+                ),
+                data_processor=self.data_processor,
+                users_cache=self.users_cache,
+                session_name=account.session_name
+            )
+            account.crawler._start_run(download_progress_callback, None)
+            try:
+                await account.crawler.connect()
+            except Exception as e:
+                print(f"账号 {account.session_name} 不可用: {str(e)}")
+                account.healthy = False
+
+        if not any(account.healthy for account in self.accounts):
+            raise Exception("会话池中没有可用的账号，请先完成各账号的登录")
+
+        # Parquet 写入器由所有账号共享
+        if parquet_dir:
+            from src.parquet_writer import ParquetWriter
+            writer = ParquetWriter(parquet_dir)
+            for account in self.accounts:
+                account.crawler.parquet_writer = writer
+
+    async def _acquire(self):
+        """选择一个可用账号：未暂停、未满载，负载最低、完成任务最少者优先"""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            while True:
+                healthy = [account for account in self.accounts if account.healthy]
+                if not healthy:
+                    raise Exception("会话池中没有可用的账号")
+                candidates = [
+                    account for account in healthy
+                    if not account.benched and account.active < self.tasks_per_account
+                ]
+                if candidates:
+                    account = min(candidates, key=lambda a: (a.active, a.completed))
+                    account.active += 1
+                    return account
+                # 等待有任务结束，或最早的 FloodWait 结束
+                benched = [account.flood_until - time.monotonic() for account in healthy if account.benched]
+                timeout = max(min(benched), 0.1) if benched else None
+                try:
+                    await asyncio.wait_for(self._condition.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _release(self, account, error=None):
+        """归还账号并更新健康状态"""
+        async with self._condition:
+            account.active -= 1
+            if error is None:
+                account.completed += 1
+                account.errors = 0
+            else:
+                account.errors += 1
+                if account.errors >= self.max_errors:
+                    print(f"账号 {account.session_name} 连续失败 {account.errors} 次，停止使用")
+                    account.healthy = False
+            self._condition.notify_all()
+
+    async def _get_entity(self, account, group_id):
+        if group_id not in account.entities:
+            account.entities[group_id] = await account.crawler._get_group_entity(group_id)
+        return account.entities[group_id]
+
+    async def _shard_ranges(self, group_id, shards):
+        """按消息ID把群组切分为 shards 个范围，返回 [(min_id, max_id), ...]"""
+        account = await self._acquire()
+        try:
+            entity = await self._get_entity(account, group_id)
+            latest = await account.crawler.rate_limiter.call(
+                'history', account.crawler.client.get_messages, entity, limit=1
+            )
+        finally:
+            await self._release(account)
+        top_id = latest[0].id if latest else 0
+        if shards <= 1 or top_id < shards * 1000:
+            return [(None, None)]
+        step = top_id // shards + 1
+        # min_id/max_id 均不含边界
+        return [(start - 1 if start > 1 else None, start + step) for start in range(1, top_id + 1, step)]
+
+    async def crawl(self, group_ids, start_date, shard_ranges=False, progress_callback=None,
+                    group_progress_callback=None, **kwargs):
+        """用会话池爬取多个群组
+
+        shard_ranges 为 True 时，每个群组再按消息ID切分为与可用账号数相同的范围，
+        由不同账号并行爬取，各范围独立保存进度。切分结果随进度保存，resume 时沿用上次的范围，
+        不按群组当前的最新消息重新切分，这样才能找到各范围的检查点。其余参数与 TelegramCrawler.start_crawling 相同。
+        返回 {group_id: {'count': 成功的范围处理的消息数, 'shards': 范围数, 'errors': [失败范围的异常]}}，
+        errors 不为空时该群组部分（或全部范围都失败时完全）失败。
+        """
+        group_ids = list(dict.fromkeys(group_ids))
+        units = []
+        for group_id in group_ids:
+            if shard_ranges:
+                ranges = self.data_processor.load_shard_plan(group_id) if kwargs.get('resume') else None
+                if ranges is None:
+                    shards = sum(1 for account in self.accounts if account.healthy)
+                    ranges = await self._shard_ranges(group_id, shards)
+                    self.data_processor.save_shard_plan(group_id, ranges)
+                for min_id, max_id in ranges:
+                    units.append((group_id, min_id, max_id))
+            else:
+                units.append((group_id, None, None))
+
+        results = {}
+        for group_id, _, _ in units:
+            result = results.setdefault(group_id, {'count': 0, 'shards': 0, 'errors': []})
+            result['shards'] += 1
+        done = [0]
+
+        async def run_unit(group_id, min_id, max_id):
+            progress_key = group_id if min_id is None and max_id is None else f"{group_id}#{min_id or 0}-{max_id or ''}"
+            group_callback = None
+            if group_progress_callback:
+                group_callback = lambda progress, text: group_progress_callback(progress_key, progress, text)
+
+            last_error = None
+            for attempt in range(self.max_attempts):
+                # 换账号重试时从该任务已保存的检查点继续，而不是从头爬取
+                options = {**kwargs, 'resume': True} if attempt else kwargs
+                account = await self._acquire()
+                try:
+                    entity = await self._get_entity(account, group_id)
+                    count = await account.crawler._crawl_group(
+                        group_id, entity, start_date,
+                        progress_callback=group_callback,
+                        min_id=min_id,
+                        max_id=max_id,
+                        progress_key=progress_key,
+                        **options
+                    )
+                except Exception as e:
+                    last_error = e
+                    print(f"[{progress_key}] 账号 {account.session_name} 第 {attempt + 1} 次尝试失败: {str(e)}")
+                    await self._release(account, e)
+                    continue
+                await self._release(account)
+                results[group_id]['count'] += count
+                break
+            else:
+                results[group_id]['errors'].append(last_error)
+
+            done[0] += 1
+            if progress_callback:
+                progress_callback(done[0] / len(units) * 100, f"已完成 {done[0]}/{len(units)} 个任务")
+
+        await asyncio.gather(*(run_unit(*unit) for unit in units))
+        for account in self.accounts:
+            if account.crawler and account.crawler.download_pool:
+                await account.crawler.download_pool.join()
+        return results
+
+    def get_messages(self):
+        """汇总各账号爬取的消息"""
+        messages = []
+        for account in self.accounts:
+            if account.crawler:
+                messages.extend(account.crawler.get_messages())
+        return messages
+
+    def status(self):
+        """各账号的健康状态和负载"""
+        return [account.status() for account in self.accounts]
+
+    async def close(self):
+        """断开所有账号"""
+        parquet_writer = None
+        for account in self.accounts:
+            if account.crawler:
+                parquet_writer = parquet_writer or account.crawler.parquet_writer
+                account.crawler.parquet_writer = None
+                await account.crawler._finish_run()
+        if parquet_writer:
+            parquet_writer.close()
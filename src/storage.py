@@ -0,0 +1,541 @@
+import json
+import os
+import sqlite3
+from collections import Counter
+from datetime import datetime, timezone
+
+
+MESSAGE_FIELDS = [
+    'id', 'group', 'sender_id', 'username', 'sender_name', 'date', 'text', 'views',
+    'media_type', 'media_path', 'media_status', 'media_size', 'media_name', 'media_key'
+]
+
+
+class MessageStore:
+    """消息存储后端接口
+
+    子类至少需要实现 upsert_messages、iter_messages 以及进度的读写；
+    统计与查询提供了基于全量遍历的默认实现，带索引的后端可以覆盖以提高效率。
+    """
+
+    def upsert_messages(self, rows):
+        """按 (group, id) 插入或更新消息行"""
+        raise NotImplementedError
+
+    def iter_messages(self, group_id):
+        """按时间顺序遍历群组的全部消息，group_id 可以是群组列表"""
+        raise NotImplementedError
+
+    def save_progress(self, group_id, last_message_id=None, start_date=None):
+        """保存爬取进度"""
+        raise NotImplementedError
+
+    def load_progress(self, group_id):
+        """读取爬取进度，不存在时返回 None"""
+        raise NotImplementedError
+
+    def update_media(self, group_id, message_id, media_path, media_status):
+        """更新单条消息的媒体下载结果"""
+        for row in self.iter_messages(group_id):
+            if row['id'] == message_id:
+                self.upsert_messages([{**row, 'media_path': media_path, 'media_status': media_status}])
+                return
+
+    def checkpoint(self, group_id, rows, last_message_id=None, start_date=None):
+        """写入一批消息并更新进度
+
+        消息按各自的 group 写入，进度记录在 group_id 下；
+        同一群组按ID范围分片爬取时，group_id 是分片的进度键。
+        """
+        self.upsert_messages(rows)
+        self.save_progress(group_id, last_message_id, start_date)
+
+    def count_messages(self, group_id):
+        return sum(1 for _ in self.iter_messages(group_id))
+
+    def get_max_message_id(self, group_id):
+        return max((row['id'] for row in self.iter_messages(group_id)), default=None)
+
+    def get_min_message_id(self, group_id):
+        return min((row['id'] for row in self.iter_messages(group_id)), default=None)
+
+    def query_messages(self, group_id, offset=0, limit=100, order_by='date', descending=False,
+                       sender_id=None, media_type=None, date_from=None, date_to=None, sender=None, after=None):
+        """分页查询消息
+
+        sender 按发送者名称或用户名的子串过滤。after 为上一页最后一行的 (排序值, 消息ID)，
+        按 date 或 id 排序时用于从该行之后继续查询（忽略 offset），翻页开销与页码无关。
+        """
+        sender = sender.lower() if sender else None
+        rows = [
+            row for row in self.iter_messages(group_id)
+            if (sender_id is None or row['sender_id'] == sender_id)
+            and (media_type is None or row['media_type'] == media_type)
+            and (date_from is None or row['date'] >= date_from)
+            and (date_to is None or row['date'] <= date_to)
+            and (sender is None or sender in f"{row['sender_name'] or ''}\n{row['username'] or ''}".lower())
+        ]
+        rows.sort(key=lambda row: (row[order_by] is None, row[order_by], row['id']), reverse=descending)
+        if after is not None and order_by in ('date', 'id'):
+            key = tuple(after)
+            rows = [
+                row for row in rows
+                if ((row[order_by], row['id']) < key if descending else (row[order_by], row['id']) > key)
+            ]
+            offset = 0
+        return rows[offset:offset + limit]
+
+    def statistics(self, group_id, top=5):
+        """统计消息数、发言人数、媒体类型分布、活跃用户和小时分布"""
+        total = 0
+        views = 0
+        senders = Counter()
+        names = {}
+        media_types = Counter()
+        hours = Counter()
+        for row in self.iter_messages(group_id):
+            total += 1
+            views += row['views'] or 0
+            senders[row['sender_id']] += 1
+            names[row['sender_id']] = row['sender_name']
+            if row['media_type']:
+                media_types[row['media_type']] += 1
+            hours[row['date'].hour] += 1
+        return {
+            'total': total,
+            'senders': len(senders),
+            'media': sum(media_types.values()),
+            'avg_views': views / total if total else 0.0,
+            'media_types': dict(media_types),
+            'top_senders': [(names[sender_id], count) for sender_id, count in senders.most_common(top)],
+            'hours': dict(sorted(hours.items()))
+        }
+
+    def close(self):
+        pass
+
+
+class SegmentLogStore(MessageStore):
+    """基于追加写入 JSONL 分段的检查点日志
+
+    每个群组一个目录，消息以 JSONL 追加写入当前分段，写满 segment_size 行后开启新分段；
+    清单记录每个分段已提交的行数和字节数，写入中途崩溃时未提交的内容在下次写入前被截断，
+    恢复时也会被忽略。
+    """
+
+    def __init__(self, save_dir="data", segment_size=10000):
+        self.save_dir = save_dir
+        self.segment_size = segment_size
+
+    def _checkpoint_dir(self, group_id):
+        """获取群组的检查点目录"""
+        safe_name = "".join(c for c in str(group_id) if c.isalnum() or c in ('-', '_', '@'))
+        return os.path.join(self.save_dir, "checkpoints", safe_name)
+
+    def _load_manifest(self, group_id):
+        """读取检查点清单"""
+        manifest_file = os.path.join(self._checkpoint_dir(group_id), "manifest.json")
+        if not os.path.exists(manifest_file):
+            return None
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_manifest(self, group_id, manifest):
+        """原子地写入检查点清单"""
+        manifest_file = os.path.join(self._checkpoint_dir(group_id), "manifest.json")
+        tmp_file = manifest_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, manifest_file)
+
+    def _encode_value(self, value):
+        """序列化 JSON 不支持的类型"""
+        if isinstance(value, datetime):
+            return value.isoformat()
+        raise TypeError(f"无法序列化类型: {type(value).__name__}")
+
+    def _decode_row(self, row):
+        """还原消息行中的时间字段，旧版记录缺少的字段补为 None"""
+        if isinstance(row.get('date'), str):
+            row['date'] = datetime.fromisoformat(row['date'])
+        for field in MESSAGE_FIELDS:
+            row.setdefault(field, None)
+        return row
+
+    def _new_manifest(self, group_id):
+        return {'group_id': group_id, 'segments': [], 'record_count': 0}
+
+    def upsert_messages(self, rows):
+        """追加写入消息行，同一消息的后续记录在重放时覆盖先前的记录"""
+        by_group = {}
+        for row in rows:
+            by_group.setdefault(row['group'], []).append(row)
+        for group_id, group_rows in by_group.items():
+            self._append_rows(group_id, group_rows)
+
+    def _append_rows(self, group_id, rows):
+        checkpoint_dir = self._checkpoint_dir(group_id)
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        manifest = self._load_manifest(group_id) or self._new_manifest(group_id)
+        segments = manifest['segments']
+
+        pending = list(rows)
+        while pending:
+            if not segments or segments[-1]['count'] >= self.segment_size:
+                segments.append({'file': f"seg_{len(segments) + 1:06d}.jsonl", 'count': 0})
+            segment = segments[-1]
+            batch = pending[:self.segment_size - segment['count']]
+            pending = pending[len(batch):]
+
+            segment_file = os.path.join(checkpoint_dir, segment['file'])
+            with open(segment_file, 'a', encoding='utf-8') as f:
+                # 截断上次崩溃时残留的未提交数据
+                f.truncate(segment.get('bytes', 0))
+                for row in batch:
+                    f.write(json.dumps(row, ensure_ascii=False, default=self._encode_value))
+                    f.write('\n')
+                f.flush()
+                os.fsync(f.fileno())
+                segment['bytes'] = f.tell()
+            segment['count'] += len(batch)
+            manifest['record_count'] += len(batch)
+
+        if rows:
+            manifest['max_message_id'] = max(manifest.get('max_message_id') or 0, max(row['id'] for row in rows))
+        self._write_manifest(group_id, manifest)
+
+    def save_progress(self, group_id, last_message_id=None, start_date=None):
+        os.makedirs(self._checkpoint_dir(group_id), exist_ok=True)
+        manifest = self._load_manifest(group_id) or self._new_manifest(group_id)
+        if last_message_id is not None:
+            manifest['last_message_id'] = last_message_id
+        if start_date:
+            manifest['start_date'] = start_date.isoformat()
+        manifest['last_update'] = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._write_manifest(group_id, manifest)
+
+    def load_progress(self, group_id):
+        manifest = self._load_manifest(group_id)
+        if manifest is None:
+            return None
+        return {
+            'group_id': group_id,
+            'last_message_id': manifest.get('last_message_id'),
+            'start_date': manifest.get('start_date'),
+            'record_count': manifest.get('record_count', 0),
+            'last_update': manifest.get('last_update')
+        }
+
+    def get_max_message_id(self, group_id):
+        # 清单中记录了最大消息ID，增量同步时无需重放分段
+        manifest = self._load_manifest(group_id)
+        if manifest is None:
+            return None
+        if 'max_message_id' in manifest:
+            return manifest['max_message_id']
+        return super().get_max_message_id(group_id)
+
+    def iter_messages(self, group_id):
+        """按顺序重放检查点分段，返回去重后的消息"""
+        if isinstance(group_id, (list, tuple, set)):
+            rows = [row for g in group_id for row in self.iter_messages(g)]
+            return iter(sorted(rows, key=lambda row: row['date']))
+        manifest = self._load_manifest(group_id)
+        if manifest is None:
+            return iter(())
+
+        checkpoint_dir = self._checkpoint_dir(group_id)
+        message_dict = {}
+        for segment in manifest['segments']:
+            segment_file = os.path.join(checkpoint_dir, segment['file'])
+            with open(segment_file, 'r', encoding='utf-8') as f:
+                for line_no, line in enumerate(f):
+                    if line_no >= segment['count']:
+                        break
+                    row = self._decode_row(json.loads(line))
+                    message_dict[row['id']] = row
+        return iter(sorted(message_dict.values(), key=lambda row: row['date']))
+
+
+class SQLiteMessageStore(MessageStore):
+    """SQLite 消息存储
+
+    messages、senders、media 三张表，消息以 (group_id, id) 为主键，并在
+    (group_id, date) 和 sender_id 上建立索引。写入在单个事务中批量完成，
+    恢复、统计和导出都通过索引查询，无需加载全部数据。
+    """
+
+    def __init__(self, db_path="data/messages.db"):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        # 爬虫线程与创建存储的线程可能不同；WAL 模式允许界面同时读取
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    group_id TEXT NOT NULL,
+                    id INTEGER NOT NULL,
+                    sender_id INTEGER,
+                    date REAL NOT NULL,
+                    text TEXT,
+                    views INTEGER,
+                    PRIMARY KEY (group_id, id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_messages_group_date ON messages (group_id, date);
+                CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages (sender_id);
+
+                CREATE TABLE IF NOT EXISTS senders (
+                    sender_id INTEGER PRIMARY KEY,
+                    username TEXT,
+                    sender_name TEXT
+                );
+
+                CREATE TABLE IF NOT EXISTS media (
+                    group_id TEXT NOT NULL,
+                    message_id INTEGER NOT NULL,
+                    media_type TEXT,
+                    media_path TEXT,
+                    media_status TEXT,
+                    media_size INTEGER,
+                    media_name TEXT,
+                    media_key TEXT,
+                    PRIMARY KEY (group_id, message_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_media_type ON media (media_type);
+
+                CREATE TABLE IF NOT EXISTS progress (
+                    group_id TEXT PRIMARY KEY,
+                    last_message_id INTEGER,
+                    start_date TEXT,
+                    last_update TEXT
+                );
+            """)
+            # 旧版数据库的 media 表缺少元数据列
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(media)")}
+            for column, column_type in (('media_size', 'INTEGER'), ('media_name', 'TEXT'), ('media_key', 'TEXT')):
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE media ADD COLUMN {column} {column_type}")
+
+    _SELECT = """
+        SELECT m.id, m.group_id, m.sender_id, s.username, s.sender_name, m.date, m.text, m.views,
+               d.media_type, d.media_path, d.media_status, d.media_size, d.media_name, d.media_key
+        FROM messages m
+        LEFT JOIN senders s ON s.sender_id = m.sender_id
+        LEFT JOIN media d ON d.group_id = m.group_id AND d.message_id = m.id
+    """
+
+    _ORDER_COLUMNS = {
+        'id': 'm.id',
+        'date': 'm.date',
+        'sender_id': 'm.sender_id',
+        'sender_name': 's.sender_name',
+        'views': 'm.views',
+        'media_type': 'd.media_type',
+        'media_size': 'd.media_size'
+    }
+
+    def _to_row(self, record):
+        """将查询结果转换为消息行"""
+        row = dict(zip(MESSAGE_FIELDS, record))
+        row['date'] = datetime.fromtimestamp(row['date'], tz=timezone.utc)
+        row['username'] = row['username'] or ''
+        row['sender_name'] = row['sender_name'] or ''
+        row['text'] = row['text'] or ''
+        return row
+
+    def upsert_messages(self, rows):
+        with self.conn:
+            self._upsert_messages(rows)
+
+    def _upsert_messages(self, rows):
+        """写入消息行，不单独提交事务"""
+        rows = list(rows)
+        if not rows:
+            return
+        self.conn.executemany(
+            "INSERT INTO messages (group_id, id, sender_id, date, text, views) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (group_id, id) DO UPDATE SET sender_id = excluded.sender_id, date = excluded.date, "
+            "text = excluded.text, views = excluded.views",
+            [
+                (str(row['group']), row['id'], row['sender_id'], row['date'].timestamp(),
+                 row['text'], row['views'])
+                for row in rows
+            ]
+        )
+        self.conn.executemany(
+            "INSERT INTO senders (sender_id, username, sender_name) VALUES (?, ?, ?) "
+            "ON CONFLICT (sender_id) DO UPDATE SET username = excluded.username, sender_name = excluded.sender_name",
+            list({
+                row['sender_id']: (row['sender_id'], row['username'], row['sender_name'])
+                for row in rows if row['sender_id'] is not None
+            }.values())
+        )
+        self.conn.executemany(
+            "INSERT INTO media (group_id, message_id, media_type, media_path, media_status, media_size, media_name, "
+            "media_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (group_id, message_id) DO UPDATE SET media_type = excluded.media_type, "
+            "media_path = excluded.media_path, media_status = excluded.media_status, "
+            "media_size = excluded.media_size, media_name = excluded.media_name, media_key = excluded.media_key",
+            [
+                (str(row['group']), row['id'], row['media_type'], row.get('media_path'), row.get('media_status'),
+                 row.get('media_size'), row.get('media_name'), row.get('media_key'))
+                for row in rows if row['media_type']
+            ]
+        )
+
+    def update_media(self, group_id, message_id, media_path, media_status):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE media SET media_path = ?, media_status = ? WHERE group_id = ? AND message_id = ?",
+                (media_path, media_status, str(group_id), message_id)
+            )
+
+    def checkpoint(self, group_id, rows, last_message_id=None, start_date=None):
+        # 消息与进度在同一事务中提交
+        with self.conn:
+            self._upsert_messages(rows)
+            self._save_progress(group_id, last_message_id, start_date)
+
+    def save_progress(self, group_id, last_message_id=None, start_date=None):
+        with self.conn:
+            self._save_progress(group_id, last_message_id, start_date)
+
+    def _save_progress(self, group_id, last_message_id=None, start_date=None):
+        self.conn.execute(
+            "INSERT INTO progress (group_id, last_message_id, start_date, last_update) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (group_id) DO UPDATE SET "
+            "last_message_id = COALESCE(excluded.last_message_id, progress.last_message_id), "
+            "start_date = COALESCE(excluded.start_date, progress.start_date), "
+            "last_update = excluded.last_update",
+            (str(group_id), last_message_id, start_date.isoformat() if start_date else None,
+             datetime.now().strftime("%Y%m%d_%H%M%S"))
+        )
+
+    def load_progress(self, group_id):
+        record = self.conn.execute(
+            "SELECT last_message_id, start_date, last_update FROM progress WHERE group_id = ?",
+            (str(group_id),)
+        ).fetchone()
+        if record is None:
+            return None
+        return {
+            'group_id': group_id,
+            'last_message_id': record[0],
+            'start_date': record[1],
+            'record_count': self.count_messages(group_id),
+            'last_update': record[2]
+        }
+
+    def _group_clause(self, group_id, column="group_id"):
+        """生成群组过滤条件，group_id 可以是单个群组或群组列表"""
+        if isinstance(group_id, (list, tuple, set)):
+            group_ids = [str(g) for g in group_id]
+        else:
+            group_ids = [str(group_id)]
+        return f"{column} IN ({', '.join('?' * len(group_ids))})", group_ids
+
+    def iter_messages(self, group_id):
+        clause, params = self._group_clause(group_id, "m.group_id")
+        cursor = self.conn.execute(self._SELECT + f" WHERE {clause} ORDER BY m.date", params)
+        for record in cursor:
+            yield self._to_row(record)
+
+    def count_messages(self, group_id):
+        clause, params = self._group_clause(group_id)
+        return self.conn.execute(f"SELECT COUNT(*) FROM messages WHERE {clause}", params).fetchone()[0]
+
+    def get_max_message_id(self, group_id):
+        return self.conn.execute(
+            "SELECT MAX(id) FROM messages WHERE group_id = ?", (str(group_id),)
+        ).fetchone()[0]
+
+    def get_min_message_id(self, group_id):
+        return self.conn.execute(
+            "SELECT MIN(id) FROM messages WHERE group_id = ?", (str(group_id),)
+        ).fetchone()[0]
+
+    def _where(self, group_id, sender_id=None, media_type=None, date_from=None, date_to=None, sender=None):
+        """生成查询条件"""
+        clause, params = self._group_clause(group_id, "m.group_id")
+        clauses = [clause]
+        if sender_id is not None:
+            clauses.append("m.sender_id = ?")
+            params.append(sender_id)
+        if media_type is not None:
+            clauses.append("d.media_type = ?")
+            params.append(media_type)
+        if date_from is not None:
+            clauses.append("m.date >= ?")
+            params.append(date_from.timestamp())
+        if date_to is not None:
+            clauses.append("m.date <= ?")
+            params.append(date_to.timestamp())
+        if sender:
+            pattern = "%" + sender.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            clauses.append("(s.sender_name LIKE ? ESCAPE '\\' OR s.username LIKE ? ESCAPE '\\')")
+            params.extend([pattern, pattern])
+        return " WHERE " + " AND ".join(clauses), params
+
+    def query_messages(self, group_id, offset=0, limit=100, order_by='date', descending=False,
+                       sender_id=None, media_type=None, date_from=None, date_to=None, sender=None, after=None):
+        where, params = self._where(group_id, sender_id, media_type, date_from, date_to, sender)
+        order = self._ORDER_COLUMNS.get(order_by, 'm.date')
+        direction = "DESC" if descending else "ASC"
+        if after is not None and order_by in ('date', 'id'):
+            # 键集分页：从上一页最后一行之后继续，不需要跳过 offset 行
+            value, message_id = after
+            if order_by == 'date':
+                value = value.timestamp()
+            operator = "<" if descending else ">"
+            where += f" AND ({order} {operator} ? OR ({order} = ? AND m.id {operator} ?))"
+            params = params + [value, value, message_id]
+            offset = 0
+        cursor = self.conn.execute(
+            self._SELECT + where + f" ORDER BY {order} {direction}, m.id {direction} LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        )
+        return [self._to_row(record) for record in cursor]
+
+    def statistics(self, group_id, top=5):
+        clause, params = self._group_clause(group_id)
+        total, senders, avg_views = self.conn.execute(
+            f"SELECT COUNT(*), COUNT(DISTINCT sender_id), AVG(views) FROM messages WHERE {clause}",
+            params
+        ).fetchone()
+        media_types = dict(self.conn.execute(
+            f"SELECT media_type, COUNT(*) FROM media WHERE {clause} AND media_type IS NOT NULL "
+            "GROUP BY media_type ORDER BY COUNT(*) DESC",
+            params
+        ).fetchall())
+        top_senders = self.conn.execute(
+            "SELECT COALESCE(s.sender_name, ''), COUNT(*) FROM messages m "
+            "LEFT JOIN senders s ON s.sender_id = m.sender_id "
+            f"WHERE m.{clause} GROUP BY m.sender_id ORDER BY COUNT(*) DESC LIMIT ?",
+            params + [top]
+        ).fetchall()
+        hours = dict(self.conn.execute(
+            "SELECT CAST(strftime('%H', date, 'unixepoch') AS INTEGER) AS hour, COUNT(*) FROM messages "
+            f"WHERE {clause} GROUP BY hour ORDER BY hour",
+            params
+        ).fetchall())
+        return {
+            'total': total,
+            'senders': senders,
+            'media': sum(media_types.values()),
+            'avg_views': avg_views or 0.0,
+            'media_types': media_types,
+            'top_senders': top_senders,
+            'hours': hours
+        }
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,67 @@
+import asyncio
+import hashlib
+import json
+
+from src.crawler import TelegramCrawler
+from src.data_processor import DataProcessor
+
+
+class Document:
+    def __init__(self, id, size):
+        self.id = id
+        self.size = size
+
+
+class Media:
+    def __init__(self, document):
+        self.document = document
+
+
+class FakeMessage:
+    def __init__(self, id, document):
+        self.id = id
+        self.chat_id = -100
+        self.media = Media(document)
+        self.document = document
+        self.photo = None
+        self.video = None
+        self.audio = None
+        self.downloads = 0
+
+    async def download_media(self, file, progress_callback=None, thumb=None):
+        self.downloads += 1
+        with open(file, 'wb') as f:
+            f.write(b'x' * self.document.size)
+        return file
+
+
+def test_legacy_record_is_reused_after_upgrade(tmp_path):
+    downloads = tmp_path / "downloads"
+    downloads.mkdir()
+    old_file = downloads / "old_video.mp4"
+    old_file.write_bytes(b'x' * 1234)
+    # 升级前的 JSON 记录，标识为 md5("消息ID_类型_大小")
+    legacy_id = hashlib.md5(b"42_document_1234").hexdigest()
+    (downloads / "download_records.json").write_text(json.dumps({
+        legacy_id: {'file_path': str(old_file), 'file_size': 1234, 'download_time': '2025-01-01T00:00:00'}
+    }))
+
+    crawler = TelegramCrawler(
+        1, 'hash',
+        download_path=str(downloads),
+        sender_cache_path=str(tmp_path / "sender_cache.db"),
+        data_processor=DataProcessor(str(tmp_path / "data"))
+    )
+    message = FakeMessage(42, Document(777, 1234))
+    path = asyncio.run(crawler._download_media(message))
+
+    assert message.downloads == 0
+    assert path is not None
+    new_id = crawler.download_manager.generate_file_id(42, 'document', 1234, "document_777")
+    assert crawler.download_manager.get_record(new_id)['file_path'] == str(old_file)
+    assert crawler.download_manager.get_record(legacy_id) is None
+
+    # 转发到其他消息的同一文档也直接复用
+    forwarded = FakeMessage(43, Document(777, 1234))
+    asyncio.run(crawler._download_media(forwarded))
+    assert forwarded.downloads == 0
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from src.crawler import TelegramCrawler
+from src.data_processor import DataProcessor
+from src.rate_limiter import RateLimiter
+
+
+class FakeMessage:
+    def __init__(self, id, date):
+        self.id = id
+        self.date = date
+
+
+class FakeClient:
+    """按 Telegram 的方式分页：已删除的消息占用页面名额但不返回，因此页面可能少于 limit 条"""
+
+    def __init__(self, count, deleted=()):
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self.messages = [FakeMessage(i, start + timedelta(minutes=i)) for i in range(1, count + 1)]
+        self.deleted = set(deleted)
+        self.requests = 0
+
+    async def iter_messages(self, entity, limit=None, offset_id=0, wait_time=None, reverse=False, **kwargs):
+        self.requests += 1
+        if reverse:
+            candidates = [m for m in self.messages if m.id > offset_id]
+        else:
+            candidates = [m for m in reversed(self.messages) if not offset_id or m.id < offset_id]
+        for message in candidates[:limit]:
+            if message.id not in self.deleted:
+                yield message
+
+
+def make_crawler(tmp_path, client):
+    crawler = TelegramCrawler(
+        1, 'hash',
+        download_path=str(tmp_path / "downloads"),
+        sender_cache_path=str(tmp_path / "sender_cache.db"),
+        rate_limiter=RateLimiter(rates={'history': 1000.0}),
+        data_processor=DataProcessor(str(tmp_path / "data"))
+    )
+    crawler.client = client
+    return crawler
+
+
+def fetch(crawler, limit=None, **kwargs):
+    queue = asyncio.Queue()
+    asyncio.run(crawler._fetch_messages(None, queue, limit, **kwargs))
+    ids = []
+    while True:
+        message = queue.get_nowait()
+        if message is None:
+            return ids
+        ids.append(message.id)
+
+
+def test_short_page_does_not_end_history(tmp_path):
+    client = FakeClient(350, deleted={340})
+    ids = fetch(make_crawler(tmp_path, client))
+    assert len(ids) == 349
+    assert ids == sorted(ids, reverse=True)
+    assert 340 not in ids and ids[-1] == 1
+
+
+def test_short_page_in_reverse(tmp_path):
+    client = FakeClient(350, deleted={5, 6, 150})
+    ids = fetch(make_crawler(tmp_path, client), reverse=True)
+    assert len(ids) == 347
+    assert ids == sorted(ids)
+
+
+def test_limit_across_short_pages(tmp_path):
+    client = FakeClient(350, deleted={340})
+    ids = fetch(make_crawler(tmp_path, client), limit=150)
+    assert len(ids) == 150
+
+
+def test_stops_at_date_window(tmp_path):
+    client = FakeClient(350)
+    from_date = client.messages[199].date  # 消息 200
+    ids = fetch(make_crawler(tmp_path, client), from_date=from_date)
+    assert ids[-1] == 200
+    assert client.requests == 2
@@ -0,0 +1,69 @@
+from telethon import TelegramClient
+from telethon.tl import types
+
+from src.media_policy import MediaPolicy, image_sizes
+
+
+class FakeMessage:
+    def __init__(self, photo=None, document=None):
+        self.photo = photo
+        self.document = document
+
+
+def progressive_photo():
+    """只有 PhotoSizeProgressive 的大尺寸，另有内嵌预览图，与客户端常见的照片一致"""
+    return types.Photo(
+        id=1, access_hash=2, file_reference=b'', date=None, dc_id=2,
+        sizes=[
+            types.PhotoStrippedSize(type='i', bytes=b'\x01\x28\x1e'),
+            types.PhotoSize(type='m', w=320, h=240, size=20000),
+            types.PhotoSizeProgressive(type='x', w=800, h=600, sizes=[5000, 30000, 70000]),
+            types.PhotoSizeProgressive(type='y', w=1280, h=960, sizes=[10000, 90000, 240000]),
+        ]
+    )
+
+
+def resolve(photo, thumb):
+    """用 Telethon 下载时选择尺寸的逻辑解析 thumb 参数"""
+    return TelegramClient._get_thumb(photo.sizes + (photo.video_sizes or []), thumb)
+
+
+def test_progressive_sizes_are_measured_by_largest_scan():
+    sizes = image_sizes(progressive_photo().sizes)
+    assert [(size.type, length) for size, _, length in sizes] == [('m', 20000), ('x', 70000), ('y', 240000)]
+
+
+def test_progressive_variant_is_downloadable():
+    photo = progressive_photo()
+    policy = MediaPolicy(variants={'photo': 800})
+    thumb, size = policy.choose(FakeMessage(photo=photo), 'photo', 240000)
+    assert (thumb, size) == ('x', 70000)
+    chosen = resolve(photo, thumb)
+    assert isinstance(chosen, types.PhotoSizeProgressive) and chosen.type == 'x'
+
+
+def test_smallest_thumb_skips_stripped_preview():
+    photo = progressive_photo()
+    thumb, size = MediaPolicy(variants={'photo': 'thumb'}).choose(FakeMessage(photo=photo), 'photo', 240000)
+    assert (thumb, size) == ('m', 20000)
+    assert resolve(photo, thumb).type == 'm'
+
+
+def test_largest_photo_size_downloads_full_file():
+    photo = progressive_photo()
+    assert MediaPolicy(variants={'photo': 2000}).choose(FakeMessage(photo=photo), 'photo', 240000) == (None, 240000)
+
+
+def test_document_thumb_by_type():
+    document = types.Document(
+        id=3, access_hash=4, file_reference=b'', date=None, mime_type='video/mp4', size=50_000_000, dc_id=2,
+        attributes=[],
+        thumbs=[
+            types.PhotoStrippedSize(type='i', bytes=b'\x01\x28\x1e'),
+            types.PhotoSizeProgressive(type='m', w=320, h=180, sizes=[3000, 12000]),
+            types.PhotoPathSize(type='j', bytes=b'\x00'),
+        ]
+    )
+    thumb, size = MediaPolicy(variants={'video': 'thumb'}).choose(FakeMessage(document=document), 'video', document.size)
+    assert (thumb, size) == ('m', 12000)
+    assert TelegramClient._get_thumb(document.thumbs, thumb).type == 'm'
@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+
+from src.media_queue import MediaQueue
+
+
+def row(message_id):
+    return {
+        'group': '-1001', 'id': message_id, 'media_type': 'photo', 'media_size': 100,
+        'media_name': None, 'media_key': f"photo_{message_id}", 'sender_name': 'a',
+        'date': datetime(2026, 1, 1, tzinfo=timezone.utc)
+    }
+
+
+def test_requeue_after_failure_resets_attempts(tmp_path):
+    queue = MediaQueue(str(tmp_path / "media_queue.db"), max_attempts=3)
+    queue.add(row(1), queued=True)
+    for _ in range(3):
+        assert [item['id'] for item in queue.claim()] == [1]
+        queue.mark_failed('-1001', 1, "error")
+    assert queue.list(statuses=['failed'])[0]['attempts'] == 3
+
+    # 再次爬取时按规则重新排队
+    queue.add(row(1), queued=True)
+    queue.flush()
+    item = queue.list()[0]
+    assert item['status'] == 'queued' and item['attempts'] == 0
+
+    queue.claim()
+    queue.mark_failed('-1001', 1, "error")
+    assert queue.list()[0]['status'] == 'queued'
+    queue.close()
+
+
+def test_deferred_registration_keeps_state(tmp_path):
+    queue = MediaQueue(str(tmp_path / "media_queue.db"), max_attempts=3)
+    queue.add(row(2), queued=True)
+    queue.claim()
+    queue.mark_failed('-1001', 2, "error")
+    queue.add(row(2), queued=False)
+    queue.flush()
+    item = queue.list()[0]
+    assert item['status'] == 'queued' and item['attempts'] == 1
+    queue.close()
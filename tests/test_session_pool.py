@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime, timezone
+
+from src.crawler import TelegramCrawler
+from src.data_processor import DataProcessor
+from src.rate_limiter import RateLimiter
+from src.session_pool import SessionPool
+
+
+class StubCrawler:
+    """记录每次 _crawl_group 的参数，前 failures 次调用抛出异常"""
+
+    def __init__(self, calls, failures):
+        self.calls = calls
+        self.failures = failures
+        self.download_pool = None
+
+    async def _crawl_group(self, group_id, entity, start_date, **kwargs):
+        self.calls.append(kwargs)
+        if len(self.calls) <= self.failures:
+            raise Exception("连接中断")
+        return 5
+
+
+def make_pool(tmp_path, calls, failures):
+    pool = SessionPool(
+        [{'session': f"s{i}", 'api_id': 1, 'api_hash': 'hash'} for i in range(2)],
+        data_processor=DataProcessor(str(tmp_path / "data"))
+    )
+    for account in pool.accounts:
+        account.crawler = StubCrawler(calls, failures)
+        account.entities['g'] = object()
+    return pool
+
+
+def test_retry_resumes_from_checkpoint(tmp_path):
+    calls = []
+    pool = make_pool(tmp_path, calls, failures=1)
+    results = asyncio.run(pool.crawl(['g'], None, keep_messages=False))
+    assert results['g'] == {'count': 5, 'shards': 1, 'errors': []}
+    assert [call.get('resume') for call in calls] == [None, True]
+    assert all(call['keep_messages'] is False for call in calls)
+
+
+def test_retry_keeps_explicit_resume(tmp_path):
+    calls = []
+    pool = make_pool(tmp_path, calls, failures=2)
+    asyncio.run(pool.crawl(['g'], None, resume=True))
+    assert [call['resume'] for call in calls] == [True, True, True]
+
+
+class EmptyClient:
+    """已爬完的范围：不再返回新消息"""
+
+    async def iter_messages(self, entity, **kwargs):
+        return
+        yield
+
+
+def make_row(message_id):
+    return {
+        'id': message_id, 'group': 'g', 'sender_id': 1, 'username': None, 'sender_name': 'a',
+        'date': datetime(2026, 1, 1, tzinfo=timezone.utc), 'text': '', 'views': 0, 'media_type': None,
+        'media_path': None, 'media_status': None, 'media_size': None, 'media_name': None, 'media_key': None
+    }
+
+
+def test_resumed_shard_loads_its_range_from_group(tmp_path):
+    data_processor = DataProcessor(str(tmp_path / "data"))
+    # 各分片分别保存进度，消息都写在群组 g 下
+    data_processor.save_progress('g#0-11', [make_row(i) for i in range(1, 11)], last_message_id=1)
+    data_processor.save_progress('g#10-21', [make_row(i) for i in range(11, 21)], last_message_id=11)
+    data_processor.save_progress('g#20-', [make_row(i) for i in range(21, 26)], last_message_id=21)
+
+    crawler = TelegramCrawler(
+        1, 'hash',
+        download_path=str(tmp_path / "downloads"),
+        sender_cache_path=str(tmp_path / "sender_cache.db"),
+        rate_limiter=RateLimiter(rates={'history': 1000.0}),
+        data_processor=data_processor
+    )
+    crawler.client = EmptyClient()
+    crawler._start_run(None, None)
+    asyncio.run(crawler._crawl_group(
+        'g', None, None, resume=True, keep_messages=True,
+        min_id=10, max_id=21, progress_key='g#10-21', allow_empty=True
+    ))
+    assert sorted(row['id'] for row in crawler.get_messages()) == list(range(11, 21))